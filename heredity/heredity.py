@@ -37,6 +37,186 @@ PROBS = {
 }
 
 
+class Model():
+    """
+    Conditional probability tables compiled from a model description.
+
+    `probs` is either shaped like `PROBS` (one gene, one binary trait)
+    or describes several genes and traits:
+        {
+            "genes": {
+                name: {"gene": {2: p, 1: p, 0: p}, "mutation": p}, ...
+            },
+            "recombination": [r, ...],
+            "traits": {
+                name: {"genes": [gene, ...],
+                       "probabilities": {copies: {value: p, ...}, ...}}
+            }
+        }
+    Genes are listed in chromosome order, and `recombination` gives the
+    probability of a crossover between each pair of consecutive genes
+    (0.5, the default, means they are unlinked). Trait probabilities are
+    keyed by number of copies of their gene, or by a tuple of numbers of
+    copies when the trait depends on several genes.
+
+    A person's gene state is an integer with two bits per gene, and
+    `states` lists the valid ones. Unlinked genes keep their number of
+    copies in those bits, so with a single gene the state is simply the
+    number of copies. Linked genes must remember which parent each copy
+    came from, so they keep the maternal allele in the low bit and the
+    paternal allele in the high bit.
+
+    Tables are indexed by gene state:
+        - `gene[s]`: probability that a person with no parents in the data
+          has state `s`
+        - `inheritance[s][f][m]`: probability that a child has state `s`
+          given a father with state `f` and a mother with state `m`
+        - `traits[name][s][v]`: probability that a person with state `s`
+          has value `v` for trait `name`
+    `trait` is the table of the trait named "trait", if there is one.
+    """
+
+    def __init__(self, probs=PROBS):
+        if "genes" not in probs:
+            probs = {
+                "genes": {
+                    "gene": {"gene": probs["gene"],
+                             "mutation": probs["mutation"]}
+                },
+                "traits": {
+                    "trait": {"genes": ["gene"],
+                              "probabilities": probs["trait"]}
+                }
+            }
+        genes = probs["genes"]
+        self.genes = tuple(genes)
+        self.recombination = tuple(
+            probs.get("recombination", [0.5] * (len(self.genes) - 1))
+        )
+        if len(self.recombination) != len(self.genes) - 1:
+            raise ValueError("need a recombination rate between each gene")
+        self.phased = any(r != 0.5 for r in self.recombination)
+
+        if self.phased:
+            self.states = tuple(range(4 ** len(self.genes)))
+        else:
+            self.states = tuple(
+                sum(copies << 2 * k for k, copies in enumerate(state))
+                for state in itertools.product(
+                    (0, 1, 2), repeat=len(self.genes))
+            )
+
+        # Founders: genes are independent, and both orders of a single
+        # copy are equally likely when the state keeps track of them
+        self.gene = dict()
+        for state in self.states:
+            p = 1
+            for k, name in enumerate(self.genes):
+                copies = self.count(state, k)
+                p *= genes[name]["gene"][copies]
+                if self.phased and copies == 1:
+                    p /= 2
+            self.gene[state] = p
+
+        # Children: combine every gamete of the mother with every
+        # gamete of the father
+        mutation = [genes[name]["mutation"] for name in self.genes]
+        gametes = {state: self.gametes(state, mutation)
+                   for state in self.states}
+        self.inheritance = {
+            child: {father: {mother: 0 for mother in self.states}
+                    for father in self.states}
+            for child in self.states
+        }
+        for father in self.states:
+            for mother in self.states:
+                for egg, p_egg in gametes[mother].items():
+                    for sperm, p_sperm in gametes[father].items():
+                        child = self.fertilize(egg, sperm)
+                        self.inheritance[child][father][mother] += (
+                            p_egg * p_sperm)
+
+        self.traits = dict()
+        for name, trait in probs.get("traits", dict()).items():
+            indices = [self.genes.index(gene) for gene in trait["genes"]]
+            table = dict()
+            for state in self.states:
+                key = tuple(self.count(state, k) for k in indices)
+                table[state] = trait["probabilities"][
+                    key if len(key) > 1 else key[0]]
+            self.traits[name] = table
+        self.trait = self.traits.get("trait")
+
+    def copies(self, state, gene):
+        """
+        Return the number of copies of `gene` in gene state `state`.
+        """
+        return self.count(state, self.genes.index(gene))
+
+    def count(self, state, k):
+        field = state >> 2 * k & 3
+        return (field & 1) + (field >> 1) if self.phased else field
+
+    def gametes(self, state, mutation):
+        """
+        Return the distribution of haplotypes (one bit per gene) that
+        a parent with gene state `state` passes on to a child.
+        """
+        if not self.phased:
+            gametes = {0: 1}
+            for k, mu in enumerate(mutation):
+                passes = (mu, 0.5, 1 - mu)[self.count(state, k)]
+                gametes = {
+                    haplotype | allele << k: p * (passes if allele else 1 - passes)
+                    for haplotype, p in gametes.items()
+                    for allele in (0, 1)
+                }
+            return gametes
+
+        # Walk along the chromosome, copying from the maternal (0) or
+        # paternal (1) strand and switching strand on each crossover
+        strands = {(0, 0): 0.5, (1, 0): 0.5}
+        for k, mu in enumerate(mutation):
+            if k > 0:
+                r = self.recombination[k - 1]
+                walked = dict()
+                for (strand, haplotype), p in strands.items():
+                    for switch, q in ((0, 1 - r), (1, r)):
+                        key = (strand ^ switch, haplotype)
+                        walked[key] = walked.get(key, 0) + p * q
+                strands = walked
+            copied = dict()
+            for (strand, haplotype), p in strands.items():
+                allele = state >> (2 * k + strand) & 1
+                for mutated, q in ((allele, 1 - mu), (1 - allele, mu)):
+                    key = (strand, haplotype | mutated << k)
+                    copied[key] = copied.get(key, 0) + p * q
+            strands = copied
+
+        gametes = dict()
+        for (_, haplotype), p in strands.items():
+            gametes[haplotype] = gametes.get(haplotype, 0) + p
+        return gametes
+
+    def fertilize(self, egg, sperm):
+        """
+        Return the gene state of a child conceived from haplotypes
+        `egg` (from the mother) and `sperm` (from the father).
+        """
+        state = 0
+        for k in range(len(self.genes)):
+            maternal, paternal = egg >> k & 1, sperm >> k & 1
+            if self.phased:
+                state |= (maternal | paternal << 1) << 2 * k
+            else:
+                state |= (maternal + paternal) << 2 * k
+        return state
+
+
+# Tables for the default model, compiled once at import time
+MODEL = Model(PROBS)
+
+
 def main():
 
     # Check for proper usage
@@ -128,7 +308,7 @@ def powerset(s):
     ]
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait, model=None):
     """
     Compute and return a joint probability.
 
@@ -138,72 +318,37 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
-    """
-    joint_prob = 1
 
-    # Keep track of gene probabilities (based on specified input) in dictionary:
-    person_probabilities = {
-        person: {
-            'gene copies': None,
-            'gene probability': None,
-            'has trait': None,
-            'trait probability': None
-        }
+    Probabilities are looked up in `model`, a compiled `Model`
+    (defaults to the one compiled from `PROBS`).
+    """
+    model = model or MODEL
+    gene_copies = {
+        person: how_many_genes(person, one_gene, two_genes)
         for person in people
     }
 
-    # Map in dictionary the gene copies and trait info of each person
-    for person in people:
-        person_probabilities[person]['gene copies'] = how_many_genes(person, one_gene, two_genes)
-        person_probabilities[person]['has trait'] = True if person in have_trait else False
-
-    # Iterate through all the people and calculate probability based on input info (one_gene, two_gene, have_trait)
+    joint_prob = 1
     for person, values in people.items():
-        # Calculate gene copies and trait probability (p_gene, p_trait),
-        # given parents gene copies knowledge (from one_gene/two_gene)
-        p_gene, p_trait = person_genes_and_trait_probabilities(person, person_probabilities, values)
-        joint_prob *= p_gene * p_trait
-        # print(f'{person} : {p_gene} * {p_trait} = {p_gene * p_trait}')
+        copies = gene_copies[person]
+
+        # If no info on parents --> Unconditional gene probability
+        if values['father'] is None and values['mother'] is None:
+            p_gene = model.gene[copies]
+        else:
+            p_gene = model.inheritance[copies][
+                gene_copies[values['father']]][gene_copies[values['mother']]]
+        joint_prob *= p_gene * model.trait[copies][person in have_trait]
     return joint_prob
 
 
-def person_genes_and_trait_probabilities(person, person_probabilities, person_values):
-    # Retrieve gene information for the person that we want to assess
-    person_gene_copies = person_probabilities[person]['gene copies']
-    person_has_trait = person_probabilities[person]['has trait']
-    # person_values = people[person]
-
-    # Calculate gene inheritance probability, based on given gene copies of parents
-    # If no info on parents --> Unconditional gene probability based on given statistics
-    if person_values['father'] is None and person_values['mother'] is None:
-        p_gene = PROBS['gene'][person_gene_copies]
-    else:
-        father = person_values['father']
-        mother = person_values['mother']
-        father_genes = person_probabilities[father]['gene copies']
-        mother_genes = person_probabilities[mother]['gene copies']
-        p_gene = inheritance_probability(person_gene_copies, father_genes, mother_genes)
-    p_trait = PROBS['trait'][person_gene_copies][person_has_trait]
-    person_probabilities[person]['gene probability'] = p_gene
-    person_probabilities[person]['trait probability'] = p_trait
-    return p_gene, p_trait
-
-
-def inheritance_probability(person_genes, father_genes, mother_genes):
-    prob_inheritance = {
-        0: PROBS['mutation'],
-        1: 0.5,
-        2: 1 - PROBS['mutation'],
-    }
-    p_inherit_father = prob_inheritance[father_genes]
-    p_inherit_mother = prob_inheritance[mother_genes]
-    if person_genes == 2:
-        p_gene = p_inherit_mother * p_inherit_father
-    elif person_genes == 1:
-        p_gene = p_inherit_mother * (1 - p_inherit_father) + p_inherit_father * (1 - p_inherit_mother)
-    else:
-        p_gene = (1 - p_inherit_mother) * (1 - p_inherit_father)
-    return p_gene
+def inheritance_probability(person_genes, father_genes, mother_genes, model=None):
+    """
+    Return the probability that a child has `person_genes` copies of the gene,
+    given the number of copies of their father and mother.
+    """
+    model = model or MODEL
+    return model.inheritance[person_genes][father_genes][mother_genes]
 
 
 def how_many_genes(person, one_gene, two_genes):
@@ -0,0 +1,379 @@
+"""
+Incremental heredity inference.
+
+A `Session` compiles a family into a junction tree once, then answers
+marginal queries by message passing. New evidence only invalidates the
+messages flowing away from the clique it is attached to, so queries after
+an observation recompute just the affected part of the family.
+"""
+import itertools
+import sys
+
+from heredity import MODEL, load_data
+
+
+class Session():
+
+    def __init__(self, people, model=None):
+        """
+        Compile `people` (as returned by `load_data`) with `model`
+        (defaults to the one compiled from `PROBS`).
+        Traits already known in `people` are added as evidence.
+        """
+        self.model = model or MODEL
+        self.people = people
+        self.traits = dict()
+        self.genes = dict()
+
+        order, cliques = eliminate(moral_graph(people))
+        self.cliques = [Clique(variables, self.model.states)
+                        for variables in cliques]
+
+        # Connect every clique to the clique of the first variable
+        # eliminated after it among its own variables
+        position = {person: i for i, person in enumerate(order)}
+        for i, clique in enumerate(self.cliques):
+            rest = [person for person in clique.variables
+                    if person != order[i]]
+            if rest:
+                j = min(position[person] for person in rest)
+                clique.connect(self.cliques[j])
+
+        # Attach each person's factors to the clique that eliminated them
+        # (family factors go to the first of child/father/mother eliminated)
+        self.home = {person: self.cliques[position[person]]
+                     for person in people}
+        for person, values in people.items():
+            if values["mother"] is None and values["father"] is None:
+                scope = (person,)
+                table = self.model.gene
+            else:
+                scope = (person, values["father"], values["mother"])
+                table = self.model.inheritance
+            clique = self.cliques[min(position[p] for p in scope)]
+            clique.factors.append((scope, table))
+
+        for clique in self.cliques:
+            clique.compile()
+
+        if self.model.trait is not None:
+            for person, values in people.items():
+                if values["trait"] is not None:
+                    self.observe_trait(person, values["trait"])
+
+    def observe_trait(self, person, value, trait="trait"):
+        """
+        Record that `person` has value `value` for trait `trait`
+        (`True`/`False` for the default binary trait).
+        `None` removes a previous observation of that trait.
+        """
+        if trait not in self.model.traits:
+            raise ValueError(f"unknown trait: {trait}")
+        if value is not None and value not in next(
+                iter(self.model.traits[trait].values())):
+            raise ValueError(f"invalid value for {trait}: {value}")
+        self.observe(self.traits, person, trait, value)
+
+    def observe_gene(self, person, copies, gene="gene"):
+        """
+        Record that `person` has `copies` copies of gene `gene`.
+        `None` removes a previous observation of that gene.
+        """
+        if gene not in self.model.genes:
+            raise ValueError(f"unknown gene: {gene}")
+        if copies is not None and copies not in (0, 1, 2):
+            raise ValueError(f"invalid number of gene copies: {copies}")
+        self.observe(self.genes, person, gene, copies)
+
+    def observe(self, evidence, person, name, value):
+        if person not in self.people:
+            raise KeyError(f"{person} not in family")
+        observed = evidence.setdefault(person, dict())
+        if value is None:
+            observed.pop(name, None)
+        else:
+            observed[name] = value
+
+        # Rebuild the evidence vector of this person and invalidate
+        # everything that depends on it
+        home = self.home[person]
+        home.evidence[person] = self.likelihood(person)
+        home.compile()
+        home.invalidate()
+
+    def likelihood(self, person):
+        """
+        Return the likelihood of the evidence about `person`
+        for each of their gene states.
+        """
+        traits = self.traits.get(person, dict())
+        genes = self.genes.get(person, dict())
+        likelihood = dict()
+        for state in self.model.states:
+            p = 1
+            for gene, copies in genes.items():
+                if self.model.copies(state, gene) != copies:
+                    p = 0
+            for trait, value in traits.items():
+                p *= self.model.traits[trait][state][value]
+            likelihood[state] = p
+        return likelihood
+
+    def gene_distribution(self, person):
+        """
+        Return the posterior distribution over gene states of `person`.
+        """
+        return self.home[person].marginal(person)
+
+    def probabilities(self):
+        """
+        Return the distribution of every gene's number of copies and
+        of every trait for everyone in the family. With the default model
+        this is the same shape as `heredity.main` computes.
+        """
+        probabilities = dict()
+        for person in self.people:
+            states = self.gene_distribution(person)
+            observed = self.traits.get(person, dict())
+            fields = dict()
+            for gene in self.model.genes:
+                fields[gene] = {2: 0, 1: 0, 0: 0}
+                for state, p in states.items():
+                    fields[gene][self.model.copies(state, gene)] += p
+            for trait, table in self.model.traits.items():
+                fields[trait] = dict.fromkeys(next(iter(table.values())), 0)
+                for state, p in states.items():
+                    if trait in observed:
+                        fields[trait][observed[trait]] += p
+                    else:
+                        for value, q in table[state].items():
+                            fields[trait][value] += p * q
+            probabilities[person] = fields
+        return probabilities
+
+
+class Clique():
+    """
+    Cluster of people in the junction tree, with its potential
+    and the messages it has sent to its neighbors.
+    """
+
+    def __init__(self, variables, states):
+        self.variables = tuple(variables)
+        self.states = states
+        self.assignments = list(
+            itertools.product(states, repeat=len(self.variables))
+        )
+        self.factors = []
+        self.evidence = dict()
+        self.potential = None
+        self.neighbors = []
+        self.separators = dict()
+        self.messages = dict()
+        self.belief = None
+
+    def connect(self, other):
+        shared = tuple(v for v in self.variables if v in other.variables)
+        self.neighbors.append(other)
+        other.neighbors.append(self)
+        self.separators[other] = tuple(
+            self.variables.index(v) for v in shared)
+        other.separators[self] = tuple(
+            other.variables.index(v) for v in shared)
+
+    def compile(self):
+        """
+        Multiply the family factors and evidence vectors of the clique.
+        """
+        index = {v: i for i, v in enumerate(self.variables)}
+        tables = [(tuple(index[v] for v in scope), table)
+                  for scope, table in self.factors]
+        tables.extend(((index[person],), vector)
+                      for person, vector in self.evidence.items())
+        self.potential = []
+        for assignment in self.assignments:
+            value = 1
+            for positions, table in tables:
+                for i in positions:
+                    table = table[assignment[i]]
+                value *= table
+            self.potential.append(value)
+
+    def invalidate(self):
+        """
+        Drop every message flowing away from this clique, and every belief
+        in its tree, since they all depend on its potential.
+        """
+        self.belief = None
+        frontier = [(self, None)]
+        while frontier:
+            clique, parent = frontier.pop()
+            for neighbor in clique.neighbors:
+                if neighbor is not parent:
+                    clique.messages.pop(neighbor, None)
+                    neighbor.belief = None
+                    frontier.append((neighbor, clique))
+
+    def message(self, target):
+        """
+        Return the message from this clique to neighboring clique `target`,
+        as a dictionary from separator assignments to values.
+        """
+        # Compute missing upstream messages first, without recursing,
+        # since chains of cliques can be as long as the family
+        stack = [(self, target)]
+        while stack:
+            clique, dest = stack[-1]
+            if dest in clique.messages:
+                stack.pop()
+                continue
+            missing = [(neighbor, clique) for neighbor in clique.neighbors
+                       if neighbor is not dest
+                       and clique not in neighbor.messages]
+            if missing:
+                stack.extend(missing)
+            else:
+                stack.pop()
+                clique.send(dest)
+        return self.messages[target]
+
+    def send(self, target):
+        """
+        Compute the message to `target`, given all other incoming messages.
+        """
+        incoming = [(self.separators[neighbor], neighbor.messages[self])
+                    for neighbor in self.neighbors if neighbor is not target]
+        keep = self.separators[target]
+        message = dict()
+        for assignment, value in zip(self.assignments, self.potential):
+            if not value:
+                continue
+            for positions, m in incoming:
+                value *= m[tuple(assignment[i] for i in positions)]
+            key = tuple(assignment[i] for i in keep)
+            message[key] = message.get(key, 0) + value
+
+        # Complete and rescale the message to avoid underflow
+        for key in itertools.product(self.states, repeat=len(keep)):
+            message.setdefault(key, 0)
+        total = sum(message.values())
+        if total == 0:
+            raise ValueError("evidence is inconsistent")
+        self.messages[target] = {k: v / total for k, v in message.items()}
+
+    def marginal(self, person):
+        """
+        Return the normalized distribution of `person`'s gene state.
+        """
+        if self.belief is None:
+            incoming = [(self.separators[neighbor], neighbor.message(self))
+                        for neighbor in self.neighbors]
+            belief = []
+            for assignment, value in zip(self.assignments, self.potential):
+                for positions, m in incoming:
+                    if not value:
+                        break
+                    value *= m[tuple(assignment[i] for i in positions)]
+                belief.append(value)
+            self.belief = belief
+
+        i = self.variables.index(person)
+        distribution = dict()
+        for assignment, value in zip(self.assignments, self.belief):
+            state = assignment[i]
+            distribution[state] = distribution.get(state, 0) + value
+        total = sum(distribution.values())
+        if total == 0:
+            raise ValueError("evidence is inconsistent")
+        return {state: p / total for state, p in distribution.items()}
+
+
+def moral_graph(people):
+    """
+    Return the moral graph of a family: everyone is connected to their
+    parents, and the parents of each child are connected to each other.
+    """
+    graph = {person: set() for person in people}
+    for person, values in people.items():
+        if values["mother"] is None and values["father"] is None:
+            continue
+        family = (person, values["father"], values["mother"])
+        for a, b in itertools.permutations(family, 2):
+            graph[a].add(b)
+    return graph
+
+
+def eliminate(graph):
+    """
+    Greedily eliminate the vertices of `graph` (min-fill, then min-degree),
+    returning the elimination order and the clique formed by each step.
+    """
+    graph = {v: set(neighbors) for v, neighbors in graph.items()}
+
+    def fill(v):
+        neighbors = list(graph[v])
+        return sum(
+            1 for a, b in itertools.combinations(neighbors, 2)
+            if b not in graph[a]
+        )
+
+    scores = {v: (fill(v), len(graph[v])) for v in graph}
+    order = []
+    cliques = []
+    while graph:
+        v = min(graph, key=lambda v: (scores[v], v))
+        neighbors = graph.pop(v)
+        del scores[v]
+        for a in neighbors:
+            graph[a].discard(v)
+            graph[a].update(neighbors - {a})
+
+        # Only vertices near the eliminated one change their scores
+        affected = set(neighbors)
+        for a in neighbors:
+            affected.update(graph[a])
+        for a in affected:
+            scores[a] = (fill(a), len(graph[a]))
+
+        order.append(v)
+        cliques.append([v] + sorted(neighbors))
+    return order, cliques
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python session.py data.csv")
+    session = Session(load_data(sys.argv[1]))
+
+    # Print results, then refine them as new traits are observed
+    while True:
+        for person, fields in session.probabilities().items():
+            print(f"{person}:")
+            for field in fields:
+                print(f"  {field.capitalize()}:")
+                for value, p in fields[field].items():
+                    print(f"    {value}: {p:.4f}")
+        try:
+            line = input("Observe (name trait|gene value, blank to quit): ")
+        except EOFError:
+            return
+        if not line.strip():
+            return
+        try:
+            person, field, value = line.split()
+            if field == "trait":
+                session.observe_trait(
+                    person, None if value == "-" else value == "1")
+            elif field == "gene":
+                session.observe_gene(
+                    person, None if value == "-" else int(value))
+            else:
+                print("Field must be trait or gene.")
+        except (ValueError, KeyError) as e:
+            print(e)
+
+
+if __name__ == "__main__":
+    main()
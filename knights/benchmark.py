@@ -0,0 +1,198 @@
+"""
+Benchmark of the entailment methods on generated knights and knaves puzzles.
+
+For each puzzle size, every method is asked which Knight/Knave symbols the
+knowledge base entails. The runner records time and peak memory per
+method, counts the models of the knowledge base, and cross-checks that all
+methods agree with each other and with the hidden solution.
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import sat
+from generate import generate
+from logic import model_check, model_check_all, parallel_pool, truth_table
+from simplify import simplify
+
+# Largest number of symbols each method is run on by default
+LIMITS = {
+    "enumerate": 12,
+    "table": 24,
+    "prune": 30,
+    "parallel": 24,
+    "sat": None
+}
+
+METHODS = {
+    "enumerate": lambda knowledge, queries: {
+        query: model_check(knowledge, query, "enumerate") for query in queries
+    },
+    "table": lambda knowledge, queries: model_check_all(knowledge, queries),
+    "prune": lambda knowledge, queries: {
+        query: model_check(knowledge, query, "prune") for query in queries
+    },
+    "parallel": lambda knowledge, queries, pool: model_check_all(
+        knowledge, queries, "parallel", pool=pool),
+    "sat": sat.entails_all,
+}
+
+# Methods run on a process pool, shared by all puzzles so that starting
+# it is not timed. Their memory is in the workers, so it is not traced
+POOLED = {"parallel"}
+
+
+def count_models(knowledge, symbols):
+    """Returns the number of models of `symbols` that satisfy knowledge."""
+    return sum(
+        knowledge.evaluate_bits(columns, mask).bit_count()
+        for columns, mask in truth_table(sorted(symbols))
+    )
+
+
+def measure(method, knowledge, queries, pool=None):
+    """
+    Runs `method` on a puzzle, returning its answers, the time it took
+    in seconds and its peak memory allocation in bytes (None if untraced).
+    Methods in POOLED run on `pool`.
+    """
+    if method in POOLED:
+        start = time.perf_counter()
+        entailed = METHODS[method](knowledge, queries, pool)
+        return entailed, time.perf_counter() - start, None
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    entailed = METHODS[method](knowledge, queries)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return entailed, elapsed, peak
+
+
+def run(speakers, statements, puzzles, methods, limits, seed,
+        simplified=False, pool=None):
+    """
+    Benchmarks `methods` on `puzzles` puzzles, returning one record each.
+    `limits` maps methods to the largest number of symbols they are run on
+    (None for no limit). Methods in POOLED run on `pool`.
+    """
+    records = []
+    for i in range(puzzles):
+        knowledge, queries, solution = generate(
+            speakers, statements, seed=None if seed is None else seed + i)
+        if simplified:
+            knowledge = simplify(knowledge)
+        symbols = set(knowledge.symbols())
+        for query in queries:
+            symbols |= query.symbols()
+
+        record = {
+            "speakers": speakers,
+            "statements": statements,
+            "symbols": len(symbols),
+            "models": (count_models(knowledge, symbols)
+                       if limits["table"] is None
+                       or len(symbols) <= limits["table"] else None),
+            "methods": dict(),
+            "errors": []
+        }
+
+        answers = dict()
+        for method in methods:
+            if limits[method] is not None and len(symbols) > limits[method]:
+                continue
+            entailed, elapsed, peak = measure(method, knowledge, queries,
+                                              pool)
+            answers[method] = entailed
+            record["methods"][method] = {
+                "seconds": elapsed,
+                "peak_bytes": peak,
+                "entailed": sum(entailed.values())
+            }
+
+            # The hidden solution is a model, so entailed symbols hold in it
+            for query, value in entailed.items():
+                if value and not solution[query]:
+                    record["errors"].append(
+                        f"{method} entails {query}, false in the solution")
+
+        # Every method must give the same answers
+        if answers:
+            reference, expected = next(iter(answers.items()))
+            for method, entailed in answers.items():
+                if entailed != expected:
+                    record["errors"].append(
+                        f"{method} disagrees with {reference}")
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark entailment methods on knights puzzles.")
+    parser.add_argument("--speakers", type=int, nargs="+",
+                        default=[2, 4, 6, 8, 12, 50, 200])
+    parser.add_argument("--statements", type=float, default=2,
+                        help="statements per speaker")
+    parser.add_argument("--puzzles", type=int, default=3,
+                        help="puzzles per size")
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS),
+                        default=list(METHODS))
+    parser.add_argument("--max-symbols", type=int,
+                        help="largest puzzle for every method but sat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--simplify", action="store_true",
+                        help="simplify knowledge bases first")
+    parser.add_argument("--json", help="file to write records to")
+    args = parser.parse_args()
+
+    limits = dict(LIMITS)
+    if args.max_symbols is not None:
+        for method in limits:
+            if method != "sat":
+                limits[method] = args.max_symbols
+
+    # Start the workers of the pool before timing anything
+    pool = None
+    if POOLED & set(args.methods):
+        pool = parallel_pool()
+        pool.map(abs, range(os.cpu_count() or 1))
+
+    records = []
+    try:
+        for speakers in args.speakers:
+            statements = max(1, round(args.statements * speakers))
+            results = run(speakers, statements, args.puzzles, args.methods,
+                          limits, args.seed, args.simplify, pool)
+            records.extend(results)
+
+            # Summarize each size by the mean time of each method
+            print(f"{speakers} speakers, {statements} statements, "
+                  f"{results[0]['symbols']} symbols")
+            for method in args.methods:
+                times = [r["methods"][method]["seconds"]
+                         for r in results if method in r["methods"]]
+                if times:
+                    peaks = [r["methods"][method]["peak_bytes"]
+                             for r in results if method in r["methods"]]
+                    memory = ("-" if None in peaks
+                              else f"{max(peaks) / 1024:.1f} KiB")
+                    print(f"    {method:<10} {1000 * sum(times) / len(times):10.2f} ms"
+                          f" {memory:>14}")
+            for result in results:
+                for error in result["errors"]:
+                    print(f"    ERROR: {error}")
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(records, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
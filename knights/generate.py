@@ -0,0 +1,104 @@
+"""
+Random knights and knaves puzzles.
+
+Every character is either a knight, who always tells the truth, or a knave,
+who always lies. A puzzle picks a hidden solution, then has random speakers
+make statements about other characters that are consistent with it: a
+knight's statements are true and a knave's are false.
+"""
+import random
+import sys
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+def characters(n):
+    """Returns the names of `n` characters: A, B, ..., Z, A1, B1, ..."""
+    return [
+        chr(ord("A") + i % 26) + (str(i // 26) if i >= 26 else "")
+        for i in range(n)
+    ]
+
+
+def knight(name):
+    return Symbol(f"{name} is a Knight")
+
+
+def knave(name):
+    return Symbol(f"{name} is a Knave")
+
+
+def generate(speakers, statements, seed=None):
+    """
+    Returns a random puzzle with `speakers` characters making `statements`
+    statements in total, as a tuple (knowledge, queries, solution):
+        - `knowledge` is the knowledge base: the rules of the game
+          and what everyone said
+        - `queries` lists the Knight and Knave symbols of every character
+        - `solution` maps each of those symbols to its value in the
+          hidden solution
+    """
+    rng = random.Random(seed)
+    names = characters(speakers)
+    solution = dict()
+    for name in names:
+        is_knight = rng.random() < 0.5
+        solution[knight(name)] = is_knight
+        solution[knave(name)] = not is_knight
+    model = {symbol.name: value for symbol, value in solution.items()}
+
+    knowledge = []
+    for name in names:
+        knowledge.append(Or(knight(name), knave(name)))
+        knowledge.append(Not(And(knight(name), knave(name))))
+
+    # A speaker is a knight exactly when what they say is true
+    for _ in range(statements):
+        speaker = rng.choice(names)
+        claim = statement(rng, names)
+        if claim.evaluate(model) != solution[knight(speaker)]:
+            claim = Not(claim)
+        knowledge.append(Biconditional(knight(speaker), claim))
+
+    queries = [symbol for name in names for symbol in (knight(name), knave(name))]
+    return And(*knowledge), queries, solution
+
+
+def statement(rng, names, depth=2):
+    """Returns a random statement about the characters in `names`."""
+    if depth == 0 or rng.random() < 0.4:
+        name = rng.choice(names)
+        return knight(name) if rng.random() < 0.5 else knave(name)
+    kind = rng.choice(["and", "or", "not", "implies", "same"])
+    if kind == "not":
+        return Not(statement(rng, names, depth - 1))
+    left = statement(rng, names, depth - 1)
+    right = statement(rng, names, depth - 1)
+    if kind == "and":
+        return And(left, right)
+    if kind == "or":
+        return Or(left, right)
+    if kind == "implies":
+        return Implication(left, right)
+    return Biconditional(left, right)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python generate.py speakers statements [seed]")
+    seed = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    knowledge, _, solution = generate(int(sys.argv[1]), int(sys.argv[2]), seed)
+
+    for conjunct in knowledge.conjuncts:
+        print(conjunct.formula())
+    print()
+    print("Solution:")
+    for symbol, value in solution.items():
+        if value:
+            print(f"    {symbol}")
+
+
+if __name__ == "__main__":
+    main()
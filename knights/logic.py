@@ -1,19 +1,90 @@
 import itertools
+import multiprocessing
+import os
+import queue
+import time
+import weakref
+
+
+class Interned(type):
+    """
+    Metaclass that makes structurally identical sentences share one node:
+    constructing a sentence from the same arguments as a live sentence
+    returns that sentence instead of building a new one.
+    """
+
+    instances = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args):
+        key = (cls, args)
+        sentence = Interned.instances.get(key)
+        if sentence is None:
+            sentence = super().__call__(*args)
+            Interned.instances[key] = sentence
+        return sentence
+
+
+class Sentence(metaclass=Interned):
+    """
+    Logical sentences are interned and immutable, so they can be shared
+    freely between knowledge bases: equal sentences are the same object,
+    and their hash and symbols are computed once, on construction.
+    """
+
+    __slots__ = ("_arguments", "_hash", "_symbols", "__weakref__")
+
+    def freeze(self, arguments, symbols, **fields):
+        """Sets the fields of a new sentence, which can't change afterwards."""
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_arguments", arguments)
+        object.__setattr__(self, "_symbols", frozenset(symbols))
+        object.__setattr__(
+            self, "_hash", hash((type(self).__name__, arguments)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("logical sentences are immutable")
 
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (type(self), self._arguments)
+
+    def __copy__(self):
+        return self
 
-class Sentence():
+    def __deepcopy__(self, memo):
+        return self
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_bits(self, columns, mask):
+        """
+        Evaluates the logical sentence in many models at once.
+        `columns` maps each symbol to an integer whose bit i is the value
+        of the symbol in model i, and `mask` has one bit set per model.
+        Returns the integer with bit i set if the sentence is true in model i.
+        """
+        raise Exception("nothing to evaluate")
+
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave some
+        symbols unassigned, with three-valued logic: returns None if the
+        value of the sentence depends on the unassigned symbols.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return self._symbols
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +114,10 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
-        self.name = name
-
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+        self.freeze((name,), {name}, name=name)
 
     def __repr__(self):
         return self.name
@@ -62,23 +128,26 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_bits(self, columns, mask):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
-
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
-        self.operand = operand
-
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
-
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        self.freeze((operand,), operand.symbols(), operand=operand)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,25 +155,27 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_bits(self, columns, mask):
+        return mask ^ self.operand.evaluate_bits(columns, mask)
+
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
-
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+        self.freeze(
+            conjuncts,
+            frozenset().union(*[conjunct.symbols() for conjunct in conjuncts]),
+            conjuncts=conjuncts
         )
 
     def __repr__(self):
@@ -113,35 +184,51 @@ class And(Sentence):
         )
         return f"And({conjunctions})"
 
-    def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+    def extend(self, *conjuncts):
+        """
+        Returns the conjunction of this sentence's conjuncts and `conjuncts`,
+        sharing the existing conjuncts rather than copying them.
+        """
+        return And(*self.conjuncts, *conjuncts)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_bits(self, columns, mask):
+        bits = mask
+        for conjunct in self.conjuncts:
+            bits &= conjunct.evaluate_bits(columns, mask)
+            if not bits:
+                break
+        return bits
+
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
-
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+        self.freeze(
+            disjuncts,
+            frozenset().union(*[disjunct.symbols() for disjunct in disjuncts]),
+            disjuncts=disjuncts
         )
 
     def __repr__(self):
@@ -151,30 +238,43 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_bits(self, columns, mask):
+        bits = 0
+        for disjunct in self.disjuncts:
+            bits |= disjunct.evaluate_bits(columns, mask)
+            if bits == mask:
+                break
+        return bits
+
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
-
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        self.freeze(
+            (antecedent, consequent),
+            antecedent.symbols() | consequent.symbols(),
+            antecedent=antecedent,
+            consequent=consequent
+        )
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +283,39 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_bits(self, columns, mask):
+        return ((mask ^ self.antecedent.evaluate_bits(columns, mask))
+                | self.consequent.evaluate_bits(columns, mask))
+
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
-
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        self.freeze(
+            (left, right),
+            left.symbols() | right.symbols(),
+            left=left,
+            right=right
+        )
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,17 +326,63 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_bits(self, columns, mask):
+        return mask ^ (self.left.evaluate_bits(columns, mask)
+                       ^ self.right.evaluate_bits(columns, mask))
+
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+# Number of models evaluated together by the "table" method of model_check
+CHUNK_SYMBOLS = 16
+
+# Number of the last check of the "parallel" method, so that every check
+# can be cancelled on its own in a shared pool
+CHECKS = itertools.count(1)
+
+# For each pool from `parallel_pool`, the shared number of the last check
+# cancelled in it
+CANCELLED = weakref.WeakKeyDictionary()
+
+# In a pool worker, the number of the last check cancelled in its pool
+cancelled = None
+
+
+def model_check(knowledge, query, method="table", processes=None, pool=None,
+                timeout=None):
+    """
+    Checks if knowledge base entails query.
+
+    `method` selects how the models are enumerated:
+        - "enumerate": build each model recursively and evaluate
+          the sentences in it
+        - "table": evaluate the sentences over whole chunks of the
+          truth table at once, with one bit per model
+        - "prune": assign symbols one at a time, most constrained first,
+          and skip every completion of a partial model in which the
+          knowledge base is already false or the query already true
+        - "parallel": like "table", but the truth table is split by fixing
+          the first symbols, and the parts are checked by a pool of
+          `processes` processes (one per CPU by default), all stopped as
+          soon as one finds a counter-model. A pool from `parallel_pool`
+          can be given instead, to reuse it across checks. Parts the pool
+          has not answered after `timeout` seconds (None to wait forever)
+          are checked in this process instead. Workers are started by
+          importing the main module, so a script using this method must
+          guard its entry point with `if __name__ == "__main__":`
+    """
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -256,8 +412,268 @@ def model_check(knowledge, query):
             return (check_all(knowledge, query, remaining, model_true) and
                     check_all(knowledge, query, remaining, model_false))
 
+    def check_partial(conjuncts, query, model):
+        """
+        Checks if the conjunction of `conjuncts` entails query in every
+        completion of a partial model.
+        """
+
+        # Prune if the knowledge base is already false, and keep only
+        # the conjuncts whose value is not known yet
+        undecided = []
+        for conjunct in conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return True
+            if value is None:
+                undecided.append(conjunct)
+
+        # Prune if the query is already true, or fail if it is false
+        # while the knowledge base is true
+        value = query.evaluate_partial(model)
+        if value is True:
+            return True
+        if value is False and not undecided:
+            return False
+
+        # Choose the unassigned symbol that appears in the most
+        # undecided sentences
+        counts = dict()
+        for sentence in undecided + ([query] if value is None else []):
+            for symbol in sentence.symbols():
+                if symbol not in model:
+                    counts[symbol] = counts.get(symbol, 0) + 1
+        p = max(counts, key=counts.get)
+
+        # Ensure entailment holds with the symbol both true and false
+        try:
+            for value in (True, False):
+                model[p] = value
+                if not check_partial(undecided, query, model):
+                    return False
+            return True
+        finally:
+            del model[p]
+
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    if method == "enumerate":
+        return check_all(knowledge, query, symbols, dict())
+    if method == "prune":
+        return check_partial(conjuncts(knowledge), query, dict())
+    if method == "table":
+        return check_table((knowledge, query, sorted(symbols), None))
+    if method == "parallel":
+        return check_parallel(knowledge, query, sorted(symbols), processes,
+                              pool, timeout)
+    raise ValueError(f"unknown model checking method: {method}")
+
+
+def check_table(part):
+    """
+    Checks if knowledge base entails query in every model of the truth
+    table of `symbols` that agrees with `fixed`, given as a tuple
+    (knowledge, query, symbols, fixed) so it can be sent to a process pool.
+    """
+    knowledge, query, symbols, fixed = part
+    return all(
+        not knowledge.evaluate_bits(columns, mask)
+        & (mask ^ query.evaluate_bits(columns, mask))
+        for columns, mask in truth_table(symbols, fixed)
+    )
+
+
+def parallel_pool(processes=None):
+    """
+    Returns a pool of `processes` processes (one per CPU by default) for
+    the "parallel" method of model_check, which can run one check at a
+    time. Workers are started from a fresh server process rather than
+    forked from this one, so they never inherit locks held at the time.
+    Like spawned processes, they import the main module first, so a
+    script creating a pool must guard its entry point with
+    `if __name__ == "__main__":`.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn")
+    shared = context.RawValue("q", 0)
+    pool = context.Pool(processes or os.cpu_count() or 1,
+                        initializer=share, initargs=(shared,))
+    CANCELLED[pool] = shared
+    return pool
+
+
+def share(shared):
+    """Keeps the number of the last cancelled check in a pool worker."""
+    global cancelled
+    cancelled = shared
+
+
+def check_part(part):
+    """
+    Checks a part of the truth table in a pool worker, like check_table,
+    given as a tuple (check, knowledge, query, symbols, fixed). Returns
+    None without checking the rest of the part once `check` is cancelled.
+    """
+    check, knowledge, query, symbols, fixed = part
+    for columns, mask in truth_table(symbols, fixed):
+        if cancelled is not None and cancelled.value >= check:
+            return None
+        if (knowledge.evaluate_bits(columns, mask)
+                & (mask ^ query.evaluate_bits(columns, mask))):
+            return False
+    return True
+
+
+def check_parallel(knowledge, query, symbols, processes=None, pool=None,
+                   timeout=None):
+    """
+    Checks if knowledge base entails query using a process pool, which is
+    created unless given as `pool`. Parts of the truth table the pool has
+    not answered within `timeout` seconds (None to wait forever) are
+    checked in this process instead.
+    """
+    processes = processes or os.cpu_count() or 1
+
+    # Split into a few parts per process, so that processes finishing
+    # early can pick up remaining parts
+    k = min(len(symbols), (4 * processes - 1).bit_length())
+    check = next(CHECKS)
+    parts = [
+        (check, knowledge, query, symbols, dict(zip(symbols, values)))
+        for values in itertools.product((False, True), repeat=k)
+    ]
+
+    own = pool is None
+    if own:
+        pool = parallel_pool(processes)
+    shared = CANCELLED.get(pool)
+
+    # Collect the answers of the parts as they come
+    answers = queue.Queue()
+    for i, part in enumerate(parts):
+        pool.apply_async(
+            check_part, (part,),
+            callback=lambda entailed, i=i: answers.put((i, entailed)),
+            error_callback=lambda error, i=i: answers.put((i, error)))
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = set(range(len(parts)))
+    try:
+        while pending:
+            wait = (None if deadline is None
+                    else max(0, deadline - time.monotonic()))
+            try:
+                i, entailed = answers.get(timeout=wait)
+            except queue.Empty:
+                break
+            if isinstance(entailed, BaseException):
+                raise entailed
+            if entailed is None:
+                # Cancelled by another check sharing the pool
+                entailed = check_table(parts[i][1:])
+            pending.discard(i)
+            if not entailed:
+                return False
+
+        # Check the parts left unanswered here, skipping those the pool
+        # answers meanwhile
+        while pending:
+            try:
+                i, entailed = answers.get_nowait()
+            except queue.Empty:
+                i = min(pending)
+                entailed = check_table(parts[i][1:])
+            if isinstance(entailed, BaseException):
+                raise entailed
+            if entailed is None:
+                # Cancelled by another check sharing the pool
+                entailed = check_table(parts[i][1:])
+            pending.discard(i)
+            if not entailed:
+                return False
+        return True
+    finally:
+        # Stop the workers still checking other parts
+        if own:
+            pool.terminate()
+        elif shared is not None:
+            shared.value = max(shared.value, check)
+
+
+def model_check_all(knowledge, queries, method="table", processes=None,
+                    pool=None, timeout=None):
+    """
+    Checks which of `queries` the knowledge base entails, returning a
+    dictionary from each query to whether it is entailed.
+
+    With the "table" method, the truth table is walked only once for all
+    queries; other methods of `model_check` check each query in turn, and
+    the "parallel" method checks them all with the same pool.
+    """
+    if method == "parallel" and pool is None:
+        with parallel_pool(processes) as pool:
+            return model_check_all(knowledge, queries, method, processes,
+                                   pool, timeout)
+    if method != "table":
+        return {query: model_check(knowledge, query, method, processes, pool,
+                                   timeout)
+                for query in queries}
+
+    symbols = set(knowledge.symbols())
+    for query in queries:
+        symbols |= query.symbols()
+
+    # A query stays entailed until a model of the knowledge base refutes it
+    entailed = {query: True for query in queries}
+    remaining = list(entailed)
+    for columns, mask in truth_table(sorted(symbols)):
+        models = knowledge.evaluate_bits(columns, mask)
+        if not models:
+            continue
+        for query in remaining:
+            if models & (mask ^ query.evaluate_bits(columns, mask)):
+                entailed[query] = False
+        remaining = [query for query in remaining if entailed[query]]
+        if not remaining:
+            break
+    return entailed
+
+
+def conjuncts(sentence):
+    """Returns the list of conjuncts of a sentence, flattening nested Ands."""
+    if not isinstance(sentence, And):
+        return [sentence]
+    return [c for conjunct in sentence.conjuncts for c in conjuncts(conjunct)]
+
+
+def truth_table(symbols, fixed=None):
+    """
+    Generates the truth table of `symbols` in chunks of at most
+    2 ** CHUNK_SYMBOLS models, as (columns, mask) pairs suitable for
+    `Sentence.evaluate_bits`. Symbols in `fixed` keep the value given
+    there in every model.
+    """
+    fixed = fixed or dict()
+    free = [symbol for symbol in symbols if symbol not in fixed]
+    inner, outer = free[:CHUNK_SYMBOLS], free[CHUNK_SYMBOLS:]
+
+    # Inner symbols take every combination of values within a chunk:
+    # symbol j alternates runs of 2 ** j false and 2 ** j true models
+    size = 2 ** len(inner)
+    mask = (1 << size) - 1
+    columns = dict()
+    for j, symbol in enumerate(inner):
+        run = 2 ** j
+        block = ((1 << run) - 1) << run
+        columns[symbol] = block * (mask // ((1 << 2 * run) - 1))
+
+    # Outer and fixed symbols are constant within a chunk
+    for symbol, value in fixed.items():
+        columns[symbol] = mask if value else 0
+    for chunk in range(2 ** len(outer)):
+        for j, symbol in enumerate(outer):
+            columns[symbol] = mask if chunk >> j & 1 else 0
+        yield columns, mask
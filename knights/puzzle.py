@@ -1,5 +1,4 @@
 from logic import *
-import copy
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -15,14 +14,14 @@ people = ['A', 'B', 'C']
 statement_symbols = []
 
 # Baseline knowledge
-knowledge = And()
+rules = []
 
 for p_talking in people[0]:
     PKnight = Symbol(f"{p_talking} is a Knight")
     PKnave = Symbol(f"{p_talking} is a Knave")
     # Map in the knowledge that each person can be either Knight or Knave (exclusive or)
-    knowledge.add(Or(PKnight, PKnave))
-    knowledge.add(Not(And(PKnight, PKnave)))
+    rules.append(Or(PKnight, PKnave))
+    rules.append(Not(And(PKnight, PKnave)))
     for p_object in people:
         # Map in the knowledge the possible inferences from what knight/kaves say
         PsaysOKnight = Symbol(f'{p_talking}says{p_object}Knight')
@@ -33,41 +32,45 @@ for p_talking in people[0]:
         rule0c2 = Not(And(PKnight, PsaysOKnave))
         rule1 = Implication(And(PKnight, PsaysOKnight), OKnight)
         rule2 = Implication(And(PKnave, PsaysOKnight), OKnave)
-        knowledge.add(rule0c1)
-        knowledge.add(rule0c2)
-        knowledge.add(rule1)
-        knowledge.add(rule2)
+        rules.append(rule0c1)
+        rules.append(rule0c2)
+        rules.append(rule1)
+        rules.append(rule2)
         if p_talking != p_object:
             rule3 = Implication(And(PKnight, PsaysOKnave), OKnave)
             rule4 = Implication(And(PKnave, PsaysOKnave), OKnight)
-            knowledge.add(rule3)
-            knowledge.add(rule4)
+            rules.append(rule3)
+            rules.append(rule4)
+knowledge = And(*rules)
 
 # Puzzle 0
 # A says "I am both a knight and a knave."
-knowledge0 = copy.deepcopy(knowledge)
-knowledge0.add(Symbol('AsaysAKnight'))
-knowledge0.add(Symbol('AsaysAKnave'))
+knowledge0 = knowledge.extend(
+    Symbol('AsaysAKnight'),
+    Symbol('AsaysAKnave')
+)
 
 # Puzzle 1
 # A says "We are both knaves."
 # B says nothing.
-knowledge1 = copy.deepcopy(knowledge)
-knowledge1.add(Symbol('AsaysAKnave'))
-knowledge1.add(Symbol('AsaysBKnave'))
+knowledge1 = knowledge.extend(
+    Symbol('AsaysAKnave'),
+    Symbol('AsaysBKnave')
+)
 
 # Puzzle 2
 # A says "We are the same kind."
 # B says "We are of different kinds."
-knowledge2 = copy.deepcopy(knowledge)
 AsaysAlikeB = Symbol('AsaysAlikeB')
 BsaysAdiffersB = Symbol('BsaysAdiffersB')
-knowledge2.add(AsaysAlikeB)
-knowledge2.add(BsaysAdiffersB)
-knowledge2.add(Implication(And(AKnight, AsaysAlikeB), BKnight))
-knowledge2.add(Implication(And(AKnave, AsaysAlikeB), BKnight))
-knowledge2.add(Implication(And(BKnight, BsaysAdiffersB), AKnave))
-knowledge2.add(Implication(And(BKnave, BsaysAdiffersB), AKnave))
+knowledge2 = knowledge.extend(
+    AsaysAlikeB,
+    BsaysAdiffersB,
+    Implication(And(AKnight, AsaysAlikeB), BKnight),
+    Implication(And(AKnave, AsaysAlikeB), BKnight),
+    Implication(And(BKnight, BsaysAdiffersB), AKnave),
+    Implication(And(BKnave, BsaysAdiffersB), AKnave)
+)
 
 # Puzzle 3
 # A says either "I am a knight." or "I am a knave.", but you don't know which.
@@ -128,8 +131,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            entailed = model_check_all(knowledge, symbols)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if entailed[symbol]:
                     print(f"    {symbol}")
 
 
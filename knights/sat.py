@@ -0,0 +1,446 @@
+"""
+Entailment by satisfiability checking.
+
+Sentences are converted to clauses with the Tseitin encoding, and a CDCL
+solver decides whether knowledge ∧ ¬query is unsatisfiable, which holds
+exactly when knowledge entails query. Unlike `model_check`, this scales to
+knowledge bases with hundreds of symbols.
+"""
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class Solver():
+    """
+    CDCL solver over integer literals: variable `v` is true in literal `v`
+    and false in literal `-v`. Clauses are lists of literals watched by their
+    first two entries; conflicts are analyzed to the first unique implication
+    point, branching follows variable activity (VSIDS) with phase saving,
+    and the search restarts on the Luby sequence.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.clauses = []
+        self.learnts = []
+        self.watches = dict()
+
+        # Per-variable state, indexed by variable (index 0 is unused)
+        self.values = [None]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+
+        # Assigned literals in order, and where each decision level starts
+        self.trail = []
+        self.limits = []
+        self.head = 0
+
+        self.heap = []
+        self.increment = 1.0
+        self.conflicts = 0
+        self.model = None
+
+    def new_variable(self):
+        """
+        Create and return a new variable.
+        """
+        self.values.append(None)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        variable = len(self.values) - 1
+        self.watches[variable] = []
+        self.watches[-variable] = []
+        heapq.heappush(self.heap, (0.0, variable))
+        return variable
+
+    def value(self, literal):
+        """
+        Return whether `literal` is true, false or unassigned (`None`).
+        """
+        value = self.values[abs(literal)]
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_clause(self, literals):
+        """
+        Add a clause (an iterable of literals) to the problem.
+        Returns False if the problem became unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        clause = []
+        for literal in literals:
+            while abs(literal) >= len(self.values):
+                self.new_variable()
+            value = self.value(literal)
+            if value or -literal in clause:
+                return True
+            if value is None and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+            self.clauses.append(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = literal > 0
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assign every literal implied by unit clauses.
+        Returns a conflicting clause, or None if there is no conflict.
+        """
+        values = self.values
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches[false_literal]
+            kept = []
+            i = 0
+            while i < len(watching):
+                clause = watching[i]
+                i += 1
+
+                # Keep the false literal in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                value = values[abs(first)]
+                if value is not None and value == (first > 0):
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal to watch
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    value = values[abs(literal)]
+                    if value is None or value == (literal > 0):
+                        clause[1], clause[k] = literal, false_literal
+                        self.watches[literal].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(first) is False:
+                        kept.extend(watching[i:])
+                        self.watches[false_literal] = kept
+                        return clause
+                    self.assign(first, clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derive a learnt clause from a conflict, returning it along with
+        the level to backtrack to. The first literal of the clause is
+        the one that becomes true after backtracking.
+        """
+        level = len(self.limits)
+        learnt = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for q in clause:
+                if q == literal:
+                    continue
+                variable = abs(q)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+
+            # Walk back along the trail to the next literal to resolve on
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learnt[0] = -literal
+
+        # Watch the literal with the highest level after the asserting one
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)),
+                      key=lambda i: self.levels[abs(learnt[i])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-a, v) for v, a in enumerate(self.activity)
+                         if v > 0 and self.values[v] is None]
+            heapq.heapify(self.heap)
+        elif self.values[variable] is None:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """
+        Undo all assignments made above decision level `level`.
+        """
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = None
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """
+        Return the unassigned variable with the highest activity,
+        or None if every variable is assigned.
+        """
+        while self.heap:
+            _, variable = heapq.heappop(self.heap)
+            if self.values[variable] is None:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Return whether the clauses are satisfiable with every literal in
+        `assumptions` true. When they are, `self.model` maps each variable
+        to its value in a satisfying assignment. Learnt clauses are kept,
+        so later calls with other assumptions benefit from earlier ones.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restarts = 0
+        budget = 100 * luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                budget -= 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnts.append(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment /= 0.95
+                continue
+
+            if budget <= 0:
+                restarts += 1
+                budget = 100 * luby(restarts)
+                self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                while abs(literal) >= len(self.values):
+                    self.new_variable()
+                value = self.value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                self.model = {v: self.values[v]
+                              for v in range(1, len(self.values))}
+                self.backtrack(0)
+                return True
+            self.limits.append(len(self.trail))
+            self.assign(variable if self.phases[variable] else -variable, None)
+
+
+def luby(i):
+    """
+    Return the `i`th element (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    """
+    size, power = 1, 0
+    while size < i + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i = i % size
+    return 2 ** power
+
+
+class Encoder():
+    """
+    Tseitin encoding of sentences into the clauses of a `Solver`.
+    Each symbol gets a variable, and so does each compound subsentence,
+    constrained to be equivalent to it; identical subsentences share one.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = solver or Solver()
+        self.variables = dict()
+        self.literals = dict()
+        self.true = None
+
+    def variable(self, name):
+        """
+        Return the variable of the symbol called `name`.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.solver.new_variable()
+        return self.variables[name]
+
+    def constant(self, value):
+        if self.true is None:
+            self.true = self.solver.new_variable()
+            self.solver.add_clause([self.true])
+        return self.true if value else -self.true
+
+    def literal(self, sentence):
+        """
+        Return a literal that is true exactly when `sentence` is.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        add = self.solver.add_clause
+        if isinstance(sentence, (And, Or)):
+            operands = (sentence.conjuncts if isinstance(sentence, And)
+                        else sentence.disjuncts)
+            if not operands:
+                return self.constant(isinstance(sentence, And))
+            if len(operands) == 1:
+                return self.literal(operands[0])
+
+            # For Or, encode ¬x ⇔ ∧¬ai with the And clauses
+            sign = 1 if isinstance(sentence, And) else -1
+            operands = [sign * self.literal(operand) for operand in operands]
+            x = self.solver.new_variable()
+            for operand in operands:
+                add([-sign * x, operand])
+            add([sign * x] + [-operand for operand in operands])
+
+        elif isinstance(sentence, Implication):
+            return self.literal(Or(Not(sentence.antecedent),
+                                   sentence.consequent))
+
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            x = self.solver.new_variable()
+            add([-x, -a, b])
+            add([-x, a, -b])
+            add([x, a, b])
+            add([x, -a, -b])
+
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[sentence] = x
+        return x
+
+    def add(self, sentence):
+        """
+        Constrain `sentence` to be true. Conjunctions and disjunctions at
+        the top level become clauses directly, without extra variables.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.solver.add_clause([-self.literal(sentence.antecedent),
+                                    self.literal(sentence.consequent)])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def model(self):
+        """
+        Return the values of symbols in the solver's last model.
+        """
+        return {name: self.solver.model[variable]
+                for name, variable in self.variables.items()}
+
+
+def satisfiable(sentence):
+    """
+    Return a model (symbol names mapped to values) in which `sentence`
+    is true, or None if there is none.
+    """
+    encoder = Encoder()
+    encoder.add(sentence)
+    if encoder.solver.solve():
+        return encoder.model()
+    return None
+
+
+def entails(knowledge, query):
+    """Checks if knowledge base entails query, by satisfiability."""
+    encoder = Encoder()
+    encoder.add(knowledge)
+    return not encoder.solver.solve([-encoder.literal(query)])
+
+
+def entails_all(knowledge, queries):
+    """
+    Checks which of `queries` the knowledge base entails, returning a
+    dictionary from each query to whether it is entailed. The knowledge
+    base is encoded once, and each query is a solver call under one
+    assumption, reusing the clauses learnt for previous queries.
+    """
+    encoder = Encoder()
+    encoder.add(knowledge)
+    return {query: not encoder.solver.solve([-encoder.literal(query)])
+            for query in queries}
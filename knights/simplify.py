@@ -0,0 +1,178 @@
+"""
+Simplification of knowledge bases before checking entailment.
+
+`simplify` returns an equivalent sentence that is usually much smaller:
+nested conjunctions and disjunctions are flattened, repeated operands are
+removed, constants are propagated, and literals asserted by the knowledge
+base are substituted into the rest of it. Every entailment method then has
+fewer nodes to evaluate, and often fewer symbols to enumerate.
+"""
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Constants: the empty conjunction is true and the empty disjunction false
+TRUE = And()
+FALSE = Or()
+
+
+def simplify(sentence):
+    """Returns a simplified sentence equivalent to `sentence`."""
+
+    # Substitute literals asserted at the top level until no new one appears
+    units = dict()
+    while True:
+        simplified = reduce(sentence, units, dict())
+        if simplified is FALSE:
+            return FALSE
+        new = dict()
+        for conjunct in operands(simplified, And):
+            literal = conjunct.operand if isinstance(conjunct, Not) else conjunct
+            if isinstance(literal, Symbol):
+                new[literal.name] = literal is conjunct
+        if not new:
+            break
+        units.update(new)
+
+    # Substituted literals were reduced to true, so assert them again
+    literals = [Symbol(name) if value else Not(Symbol(name))
+                for name, value in units.items()]
+    return combine(And, literals + operands(simplified, And))
+
+
+def reduce(sentence, units, cache):
+    """
+    Returns a simplified version of `sentence`, with the symbols in `units`
+    replaced by their values. `cache` maps sentences already simplified
+    to their result, so shared subsentences are only simplified once.
+    """
+    if sentence in cache:
+        return cache[sentence]
+
+    if isinstance(sentence, Symbol):
+        if sentence.name not in units:
+            result = sentence
+        else:
+            result = TRUE if units[sentence.name] else FALSE
+
+    elif isinstance(sentence, Not):
+        result = negate(reduce(sentence.operand, units, cache))
+
+    elif isinstance(sentence, And):
+        result = combine(And, [reduce(conjunct, units, cache)
+                               for conjunct in sentence.conjuncts])
+
+    elif isinstance(sentence, Or):
+        result = combine(Or, [reduce(disjunct, units, cache)
+                              for disjunct in sentence.disjuncts])
+
+    elif isinstance(sentence, Implication):
+        antecedent = reduce(sentence.antecedent, units, cache)
+        consequent = reduce(sentence.consequent, units, cache)
+        if antecedent is FALSE or consequent is TRUE or antecedent is consequent:
+            result = TRUE
+        elif antecedent is TRUE:
+            result = consequent
+        elif consequent is FALSE:
+            result = negate(antecedent)
+        else:
+            result = Implication(antecedent, consequent)
+
+    elif isinstance(sentence, Biconditional):
+        left = reduce(sentence.left, units, cache)
+        right = reduce(sentence.right, units, cache)
+        if left is right:
+            result = TRUE
+        elif left is negate(right):
+            result = FALSE
+        elif left is TRUE or left is FALSE:
+            result = right if left is TRUE else negate(right)
+        elif right is TRUE or right is FALSE:
+            result = left if right is TRUE else negate(left)
+        else:
+            result = Biconditional(left, right)
+
+    else:
+        raise TypeError("must be a logical sentence")
+
+    cache[sentence] = result
+    return result
+
+
+def negate(sentence):
+    """Returns the negation of a simplified sentence."""
+    if sentence is TRUE:
+        return FALSE
+    if sentence is FALSE:
+        return TRUE
+    if isinstance(sentence, Not):
+        return sentence.operand
+    return Not(sentence)
+
+
+def operands(sentence, connective):
+    """
+    Returns the operands of `sentence` if it is built with `connective`
+    (And or Or), or else a list with just `sentence`.
+    """
+    if isinstance(sentence, And) and connective is And:
+        return list(sentence.conjuncts)
+    if isinstance(sentence, Or) and connective is Or:
+        return list(sentence.disjuncts)
+    return [sentence]
+
+
+def combine(connective, sentences):
+    """
+    Returns the conjunction (`connective` is And) or disjunction (Or) of
+    simplified sentences, flattened and without repeated operands.
+    """
+    absorbing, neutral = (FALSE, TRUE) if connective is And else (TRUE, FALSE)
+    result = dict()
+    for sentence in sentences:
+        for operand in operands(sentence, connective):
+            if operand is absorbing or negate(operand) in result:
+                return absorbing
+            if operand is not neutral:
+                result[operand] = True
+    if len(result) == 1:
+        return next(iter(result))
+    return connective(*result)
+
+
+def size(sentence):
+    """Returns the number of nodes in a sentence."""
+    if isinstance(sentence, Symbol):
+        return 1
+    if isinstance(sentence, Not):
+        return 1 + size(sentence.operand)
+    if isinstance(sentence, And):
+        return 1 + sum(size(conjunct) for conjunct in sentence.conjuncts)
+    if isinstance(sentence, Or):
+        return 1 + sum(size(disjunct) for disjunct in sentence.disjuncts)
+    if isinstance(sentence, Implication):
+        return 1 + size(sentence.antecedent) + size(sentence.consequent)
+    return 1 + size(sentence.left) + size(sentence.right)
+
+
+def report(original, simplified):
+    """Describes how much smaller a simplified sentence is."""
+    before, after = size(original), size(simplified)
+    symbols = len(original.symbols()), len(simplified.symbols())
+    reduction = 100 * (before - after) / before if before else 0
+    return (f"{before} -> {after} nodes ({reduction:.0f}% smaller), "
+            f"{symbols[0]} -> {symbols[1]} symbols")
+
+
+def main():
+    import puzzle
+    puzzles = [
+        ("Puzzle 0", puzzle.knowledge0),
+        ("Puzzle 1", puzzle.knowledge1),
+        ("Puzzle 2", puzzle.knowledge2),
+        ("Puzzle 3", puzzle.knowledge3)
+    ]
+    for name, knowledge in puzzles:
+        print(f"{name}: {report(knowledge, simplify(knowledge))}")
+
+
+if __name__ == "__main__":
+    main()
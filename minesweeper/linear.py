@@ -0,0 +1,89 @@
+"""
+Minesweeper inference by linear algebra over the frontier.
+
+Every sentence is a linear equation: the sum of its cells (each 0 for safe
+or 1 for a mine) equals its count. Each component of sentences sharing
+cells becomes a sparse system of equations, brought to reduced row echelon
+form with exact fractions. Every row of the reduced system is itself an
+equation the cells must satisfy, and since cells are 0 or 1, a row whose
+right-hand side equals the smallest or the largest value its left-hand side
+can take forces all of its cells at once. This finds deductions that need
+several overlapping sentences, which subset inference misses.
+"""
+from fractions import Fraction
+
+from probability import components
+
+
+def reduce(sentences):
+    """
+    Returns the reduced row echelon form of the system of `sentences`
+    (a list of (cells, count) pairs), as a list of (row, value) pairs
+    where `row` maps cells to nonzero coefficients.
+    """
+    pivots = dict()
+    for cells, count in sentences:
+        row = {cell: Fraction(1) for cell in cells}
+        value = Fraction(count)
+
+        # Eliminate the pivots of earlier rows from this one
+        for pivot in [cell for cell in row if cell in pivots]:
+            factor = row[pivot]
+            pivot_row, pivot_value = pivots[pivot]
+            for cell, coefficient in pivot_row.items():
+                updated = row.get(cell, 0) - factor * coefficient
+                if updated:
+                    row[cell] = updated
+                else:
+                    row.pop(cell, None)
+            value -= factor * pivot_value
+        if not row:
+            continue
+
+        # Normalize on a new pivot and eliminate it from earlier rows
+        pivot = min(row)
+        factor = row[pivot]
+        row = {cell: coefficient / factor for cell, coefficient in row.items()}
+        value /= factor
+        for other, (other_row, other_value) in pivots.items():
+            if pivot in other_row:
+                factor = other_row[pivot]
+                for cell, coefficient in row.items():
+                    updated = other_row.get(cell, 0) - factor * coefficient
+                    if updated:
+                        other_row[cell] = updated
+                    else:
+                        other_row.pop(cell, None)
+                pivots[other] = (other_row, other_value - factor * value)
+        pivots[pivot] = (row, value)
+    return list(pivots.values())
+
+
+def forced(sentences, settled=None):
+    """
+    Returns the sets of cells the `sentences` (a list of (cells, count)
+    pairs) force to be safe and to be mines. `settled` is a set of
+    components (as frozensets of sentences) known to force no cell, which
+    are skipped; components found to force no cell are added to it.
+    """
+    safes = set()
+    mines = set()
+    for component in components(sentences):
+        key = frozenset(component)
+        if settled is not None and key in settled:
+            continue
+        found = len(safes) + len(mines)
+        for row, value in reduce(component):
+            low = sum(c for c in row.values() if c < 0)
+            high = sum(c for c in row.values() if c > 0)
+
+            # At a bound, every cell takes the value that reaches it
+            if value == low or value == high:
+                for cell, coefficient in row.items():
+                    if (coefficient > 0) == (value == high):
+                        mines.add(cell)
+                    else:
+                        safes.add(cell)
+        if settled is not None and len(safes) + len(mines) == found:
+            settled.add(key)
+    return safes, mines
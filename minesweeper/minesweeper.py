@@ -1,5 +1,15 @@
 import itertools
+import logging
 import random
+import time
+
+import numpy as np
+
+import linear
+import probability
+
+# The AI's reasoning is logged at DEBUG level
+logger = logging.getLogger(__name__)
 
 
 class Minesweeper():
@@ -7,32 +17,90 @@ class Minesweeper():
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, no_guess=False,
+                 start=None, attempts=1000):
+        """
+        Creates a board with `mines` mines placed at random. With `no_guess`,
+        the board can be solved from cell `start` (the center by default),
+        which has no mine nearby, without ever guessing; boards are drawn
+        until one passes, up to `attempts` times. The seconds generation
+        took and the number of boards drawn are kept in `generation_time`
+        and `generation_attempts`.
+        """
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        started = time.perf_counter()
+        if not no_guess:
+            self.place(mines)
+            self.generation_attempts = 1
+        else:
+            if start is None:
+                start = (height // 2, width // 2)
+            i, j = start
+            excluded = {(n_i, n_j)
+                        for n_i in range(max(i - 1, 0), min(i + 2, height))
+                        for n_j in range(max(j - 1, 0), min(j + 2, width))}
+            for attempt in range(1, attempts + 1):
+                self.place(mines, excluded)
+                if self.solvable(start):
+                    break
+            else:
+                raise ValueError(
+                    f"no board solvable without guessing in {attempts} attempts")
+            self.generation_attempts = attempt
+        self.generation_time = time.perf_counter() - started
 
         # At first, player has found no mines
         self.mines_found = set()
 
+    def place(self, mines, excluded=()):
+        """
+        Places `mines` mines at random, outside of the `excluded` cells,
+        by sampling their positions without replacement.
+        """
+        excluded = sorted(i * self.width + j for i, j in excluded)
+        if not 0 <= mines <= self.height * self.width - len(excluded):
+            raise ValueError("too many mines for the board")
+
+        # Sample among the other cells, then skip over the excluded ones
+        positions = random.sample(
+            range(self.height * self.width - len(excluded)), mines)
+        if excluded:
+            for k, position in enumerate(positions):
+                for n in excluded:
+                    if position >= n:
+                        position += 1
+                positions[k] = position
+
+        self.board = np.zeros(self.height * self.width, dtype=bool)
+        self.board[positions] = True
+        self.board = self.board.reshape(self.height, self.width)
+        self.mines = {divmod(position, self.width) for position in positions}
+
+        # Count the mines around every cell at once: convolve the board
+        # with a 3x3 window of ones, then leave out the cell itself
+        padded = np.pad(self.board.astype(np.int8), 1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, (3, 3))
+        self.counts = windows.sum(axis=(2, 3), dtype=np.int8) - self.board
+
+    def solvable(self, start):
+        """
+        Checks if the AI can reveal every safe cell starting from `start`
+        without guessing.
+        """
+        ai = MinesweeperAI(self.height, self.width, len(self.mines),
+                           backend="matrix")
+        move = start
+        while move is not None:
+            if self.is_mine(move):
+                return False
+            ai.add_knowledge(move, self.nearby_mines(move))
+            move = ai.make_safe_move()
+        return len(ai.moves_made) == self.height * self.width - len(self.mines)
+
     def print(self):
         """
         Prints a text-based representation
@@ -49,8 +117,7 @@ class Minesweeper():
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +125,28 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        return int(self.counts[cell])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+    def reveal(self, cell):
+        """
+        Returns the cells uncovered by clicking on a safe cell, mapped to
+        their numbers of nearby mines: the cell itself and, if no mine is
+        nearby, the whole region of such cells around it and its border.
+        """
+        if self.is_mine(cell):
+            raise ValueError("cell is a mine")
+        revealed = {cell: self.nearby_mines(cell)}
+        frontier = [cell] if revealed[cell] == 0 else []
+        while frontier:
+            i, j = frontier.pop()
+            for n_i in range(max(i - 1, 0), min(i + 2, self.height)):
+                for n_j in range(max(j - 1, 0), min(j + 2, self.width)):
+                    if (n_i, n_j) not in revealed:
+                        count = int(self.counts[n_i, n_j])
+                        revealed[n_i, n_j] = count
+                        if count == 0:
+                            frontier.append((n_i, n_j))
+        return revealed
 
     def won(self):
         """
@@ -126,6 +197,12 @@ class Sentence():
                 self.safes.add(n_cell)
         return self.safes
 
+    def key(self):
+        """
+        Returns the cells and count of the sentence, which identify it.
+        """
+        return frozenset(self.cells), self.count
+
     def mark_mine(self, cell):
         """
         Updates internal knowledge representation given the fact that
@@ -147,17 +224,35 @@ class Sentence():
 
 
 
+# Inference backends of MinesweeperAI
+BACKENDS = ["sentences", "matrix"]
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, budget=0.1,
+                 backend="sentences"):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # How new sentences are inferred: from subsets of sentences
+        # ("sentences"), or by row reduction of the frontier ("matrix")
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend: {backend}")
+        self.backend = backend
+        self.settled = set()
+
+        # Total number of mines, if known, and seconds to spend
+        # working out the safest cell when no cell is known to be safe
+        self.mine_count = mines
+        self.budget = budget
+        self.solutions = dict()
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -165,8 +260,13 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by number, the numbers
+        # of the sentences mentioning each cell, and the number of the
+        # sentence with each set of cells and count
+        self.knowledge = dict()
+        self.index = dict()
+        self.keys = dict()
+        self.numbers = itertools.count()
 
         # All possible cells in the board
         self.board_available_cells = {(i,j) for i in range(0, height) for j in range(0, width)}
@@ -176,30 +276,127 @@ class MinesweeperAI():
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
-            # check if new piece of knowledge (MINE cell) grants new inferences on sentence content
-            unknown_sentence_cells = sentence.cells.copy()
-            if sentence.count == 0:
-                # all remaining cells are SAFES and thus needs to be marked so
-                for n_mine in unknown_sentence_cells:
-                    self.mark_safe(n_mine)
+        self.update([(cell, True)], set())
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
-            # check if new piece of knowledge (SAFE cell) grants new inferences on sentence content
-            unknown_sentence_cells = sentence.cells.copy()
-            if sentence.count == len(unknown_sentence_cells):
-                # all remaining cells are MINES and thus needs to be marked so
-                for n_mine in unknown_sentence_cells:
-                    self.mark_mine(n_mine)
+        self.update([(cell, False)], set())
+
+    def update(self, pending, changed):
+        """
+        Draws conclusions until none is left: marks every cell in `pending`,
+        a list of (cell, is a mine) pairs, and infers new sentences from
+        the sentences numbered in `changed`. Only the sentences mentioning
+        a marked cell are updated, and only the sentences sharing a cell
+        with a changed sentence are compared with it.
+        """
+        while pending or changed:
+            if pending:
+                cell, mine = pending.pop()
+                if cell in self.mines or cell in self.safes:
+                    continue
+                if mine:
+                    self.mines.add(cell)
+                else:
+                    self.safes.add(cell)
+                for number in self.index.pop(cell, ()):
+                    sentence = self.knowledge[number]
+                    del self.keys[sentence.key()]
+                    if mine:
+                        sentence.mark_mine(cell)
+                    else:
+                        sentence.mark_safe(cell)
+                    if sentence.key() in self.keys:
+                        self.remove(number)
+                    else:
+                        self.keys[sentence.key()] = number
+                        changed.add(number)
+                continue
+
+            number = changed.pop()
+            if number not in self.knowledge:
+                continue
+            sentence = self.knowledge[number]
+
+            # All cells are safe, or all cells are mines
+            if sentence.count == 0 or sentence.count == len(sentence.cells):
+                for n_cell in sentence.cells:
+                    pending.append((n_cell, sentence.count > 0))
+                self.remove(number)
+                continue
+
+            if self.backend != "sentences":
+                continue
+
+            # If a sentence's cells are a subset of another's, the other
+            # cells hold the difference of their counts
+            others = set()
+            for n_cell in sentence.cells:
+                others |= self.index[n_cell]
+            others.discard(number)
+            for other in others:
+                other_sentence = self.knowledge[other]
+                if sentence.cells < other_sentence.cells:
+                    inferred = Sentence(other_sentence.cells - sentence.cells,
+                                        other_sentence.count - sentence.count)
+                elif other_sentence.cells < sentence.cells:
+                    inferred = Sentence(sentence.cells - other_sentence.cells,
+                                        sentence.count - other_sentence.count)
+                else:
+                    continue
+                inferred_number = self.register(inferred)
+                if inferred_number is not None:
+                    changed.add(inferred_number)
+
+    def register(self, sentence):
+        """
+        Adds a sentence to the knowledge base, returning its number,
+        or None if the knowledge base already has it.
+        """
+        if sentence.key() in self.keys:
+            return None
+        number = next(self.numbers)
+        self.knowledge[number] = sentence
+        self.keys[sentence.key()] = number
+        for n_cell in sentence.cells:
+            self.index.setdefault(n_cell, set()).add(number)
+        return number
+
+    def remove(self, number):
+        """
+        Removes sentence `number` from the knowledge base.
+        """
+        sentence = self.knowledge.pop(number)
+        if self.keys.get(sentence.key()) == number:
+            del self.keys[sentence.key()]
+        for n_cell in sentence.cells:
+            self.index[n_cell].discard(number)
+
+    def eliminate(self):
+        """
+        Marks every cell forced by the reduced row echelon form of the
+        knowledge base, until no new cell is forced.
+        """
+        while True:
+            safes, mines = linear.forced(
+                [sentence.key() for sentence in self.knowledge.values()],
+                self.settled)
+            if not safes and not mines:
+                return
+            self.update([(cell, False) for cell in safes]
+                        + [(cell, True) for cell in mines], set())
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, along with everything
+        that can be concluded from it.
+        """
+        number = self.register(sentence)
+        if number is not None:
+            self.update([], {number})
 
     def shape_sentence_from(self, cell, count):
 
@@ -233,8 +430,10 @@ class MinesweeperAI():
         # create new sentence for filtered SO FAR UNKNOWN cells
         new_sentence = Sentence(unknown_nearby_cells, count)
 
-        print(f'.... Move: {cell} - New sentence: {new_sentence} - New safes: {new_sentence.known_safes()} - New mines: {new_sentence.known_mines()}')
-        return new_sentence, new_sentence.known_safes(), new_sentence.known_mines()
+        new_safes, new_mines = new_sentence.known_safes(), new_sentence.known_mines()
+        logger.debug('.... Move: %s - New sentence: %s - New safes: %s - New mines: %s',
+                     cell, new_sentence, new_safes, new_mines)
+        return new_sentence, new_safes, new_mines
 
     def add_knowledge(self, cell, count):
         """
@@ -272,14 +471,12 @@ class MinesweeperAI():
         new_sentence, new_safes, new_mines = self.shape_sentence_from(cell, count)
 
         # update knowledge base (knowledge, safes, mines) based on new_sentence
-        self.knowledge.append(new_sentence)
-        for n_safe in new_safes:
-            self.mark_safe(n_safe)
-        for n_mine in new_mines:
-            self.mark_mine(n_mine)
+        self.add_sentence(new_sentence)
+        if self.backend == "matrix":
+            self.eliminate()
 
-        print(f'.... KSafe - {self.safes}')
-        print(f'.... KMine - {self.mines}')
+        logger.debug('.... KSafe - %s', self.safes)
+        logger.debug('.... KMine - %s', self.mines)
 
         return
 
@@ -294,7 +491,7 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
         safe_possible_moves = self.safes - self.moves_made
-        print(f'Safe options: {safe_possible_moves}')
+        logger.debug('Safe options: %s', safe_possible_moves)
         if len(safe_possible_moves):
             return safe_possible_moves.pop()
         return None
@@ -302,12 +499,19 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        The cell chosen is the one least likely to be a mine.
         """
         possible_moves = self.board_available_cells - self.mines - self.moves_made
-        if len(possible_moves):
-            return possible_moves.pop()
-        return None
+        if not possible_moves:
+            return None
+        mines = None
+        if self.mine_count is not None:
+            mines = self.mine_count - len(self.mines)
+        risks = probability.probabilities(
+            [sentence.key() for sentence in self.knowledge.values()],
+            possible_moves, mines, self.budget, self.solutions)
+        return min(possible_moves, key=lambda cell: (risks[cell], cell))
 
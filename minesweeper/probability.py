@@ -0,0 +1,240 @@
+"""
+Mine probabilities of the unknown cells of a Minesweeper board.
+
+The sentences of the knowledge base only mention the cells next to revealed
+ones (the frontier). Sentences sharing cells form independent components,
+and the consistent mine configurations of each component are enumerated by
+backtracking. When the total number of mines is known, the configurations
+of all components and of the cells no sentence mentions are weighted by
+the number of ways to place the remaining mines, which gives the exact
+probability that each unknown cell is a mine.
+
+Components too large to enumerate within the time budget are approximated
+from the counts of the sentences mentioning each cell.
+"""
+import math
+import time
+
+# Largest component enumerated exactly, in cells
+MAX_CELLS = 200
+
+
+class Timeout(Exception):
+    """
+    Raised when enumerating a component takes longer than its budget.
+    """
+
+
+def components(sentences):
+    """
+    Splits `sentences`, a list of (cells, count) pairs, into lists of
+    sentences that share cells with each other and with no other sentence.
+    """
+    parent = list(range(len(sentences)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = dict()
+    for i, (cells, _) in enumerate(sentences):
+        for cell in cells:
+            if cell in owner:
+                parent[find(i)] = find(owner[cell])
+            else:
+                owner[cell] = i
+
+    groups = dict()
+    for i, sentence in enumerate(sentences):
+        groups.setdefault(find(i), []).append(sentence)
+    return list(groups.values())
+
+
+def solve(sentences, deadline=None):
+    """
+    Enumerates the mine configurations of a component consistent with all
+    its `sentences`. Returns the cells of the component and a dictionary
+    from each number of mines to the number of configurations with that
+    many mines and, for each cell, how many of them have a mine in it.
+    Raises Timeout if `deadline` passes first.
+    """
+    # Order cells so that each sentence is completed as early as possible
+    cells = []
+    seen = set()
+    for sentence_cells, _ in sorted(sentences, key=lambda s: len(s[0])):
+        for cell in sorted(sentence_cells):
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+    position = {cell: i for i, cell in enumerate(cells)}
+    if len(cells) > MAX_CELLS:
+        raise Timeout
+
+    # For each sentence, the mines it still needs and its unassigned cells
+    needed = [count for _, count in sentences]
+    unassigned = [len(sentence_cells) for sentence_cells, _ in sentences]
+    constraints = [[] for _ in cells]
+    for k, (sentence_cells, _) in enumerate(sentences):
+        for cell in sentence_cells:
+            constraints[position[cell]].append(k)
+
+    solutions = dict()
+    assignment = [0] * len(cells)
+    nodes = 0
+
+    def assign(i, mines):
+        nonlocal nodes
+        nodes += 1
+        if (deadline is not None and not nodes & 1023
+                and time.perf_counter() > deadline):
+            raise Timeout
+        if i == len(cells):
+            solution = solutions.setdefault(mines, [0, [0] * len(cells)])
+            solution[0] += 1
+            for j, value in enumerate(assignment):
+                solution[1][j] += value
+            return
+        for value in (0, 1):
+            # Each sentence needs between 0 and its unassigned cells mines
+            if all(0 <= needed[k] - value <= unassigned[k] - 1
+                   for k in constraints[i]):
+                for k in constraints[i]:
+                    needed[k] -= value
+                    unassigned[k] -= 1
+                assignment[i] = value
+                assign(i + 1, mines + value)
+                for k in constraints[i]:
+                    needed[k] += value
+                    unassigned[k] += 1
+        assignment[i] = 0
+
+    assign(0, 0)
+    return cells, {mines: (count, cell_counts)
+                   for mines, (count, cell_counts) in solutions.items()}
+
+
+def approximate(sentences):
+    """
+    Returns an estimate of the mine probability of each cell of a
+    component: the average density of the sentences mentioning it.
+    """
+    densities = dict()
+    for cells, count in sentences:
+        for cell in cells:
+            densities.setdefault(cell, []).append(count / len(cells))
+    return {cell: sum(d) / len(d) for cell, d in densities.items()}
+
+
+def convolve(a, b):
+    """
+    Returns the distribution of the sum of two numbers of mines, given
+    as dictionaries from numbers of mines to weights.
+    """
+    result = dict()
+    for i, p in a.items():
+        for j, q in b.items():
+            result[i + j] = result.get(i + j, 0) + p * q
+    return result
+
+
+def probabilities(sentences, unknown, mines=None, budget=None, cache=None):
+    """
+    Returns a dictionary from each cell in `unknown` to the probability
+    that it is a mine, given the `sentences` (a list of (cells, count)
+    pairs) about those cells and the number of `mines` left among them
+    (None if unknown). Enumeration stops after `budget` seconds, and
+    components not yet solved by then are approximated. `cache` is a
+    dictionary keeping the solutions of components between calls.
+    """
+    start = time.perf_counter()
+    cache = cache if cache is not None else dict()
+    risks = dict()
+
+    # Enumerate the components, smallest first, within the budget
+    solved = []
+    approximated = []
+    for component in sorted(components(sentences), key=len):
+        key = frozenset(component)
+        if key not in cache:
+            deadline = None if budget is None else start + budget
+            try:
+                cache[key] = solve(component, deadline)
+            except Timeout:
+                approximated.append(component)
+                continue
+
+        # Sentences no configuration satisfies cannot be enumerated
+        if cache[key][1]:
+            solved.append(cache[key])
+        else:
+            approximated.append(component)
+
+    # Approximated components are assumed to hold their expected mines
+    for component in approximated:
+        risks.update(approximate(component))
+    frontier = {cell for cells, _ in sentences for cell in cells}
+    interior = [cell for cell in unknown if cell not in frontier]
+    if mines is not None:
+        mines -= round(sum(risks.values()))
+
+    # Weight of each number of mines among the solved components and the
+    # interior cells, in each way of placing the remaining mines
+    weights = None
+    if mines is not None:
+        distributions = [{k: count for k, (count, _) in solutions.items()}
+                         for _, solutions in solved]
+        combinations = dict()
+
+        def ways(k):
+            # Ways to place k mines among the interior cells
+            if not 0 <= k <= len(interior):
+                return 0
+            if k not in combinations:
+                combinations[k] = math.comb(len(interior), k)
+            return combinations[k]
+
+        # Distributions of all components before and after each one
+        before = [{0: 1}]
+        for distribution in distributions:
+            before.append(convolve(before[-1], distribution))
+        after = [{0: 1}]
+        for distribution in reversed(distributions):
+            after.append(convolve(after[-1], distribution))
+        after.reverse()
+
+        total = sum(w * ways(mines - k) for k, w in before[-1].items())
+        if total:
+            weights = (before, after, total)
+
+    if weights is None:
+        # Without a usable mine count, weigh every configuration alike,
+        # and give interior cells the average density of the frontier
+        for cells, solutions in solved:
+            count = sum(n for n, _ in solutions.values())
+            for i, cell in enumerate(cells):
+                risks[cell] = sum(c[i] for _, c in solutions.values()) / count
+        density = sum(risks.values()) / len(frontier) if frontier else 0.5
+        for cell in interior:
+            risks[cell] = density
+        return risks
+
+    before, after, total = weights
+    for n, (cells, solutions) in enumerate(solved):
+        others = convolve(before[n], after[n + 1])
+        cell_weights = [0] * len(cells)
+        for k, (_, cell_counts) in solutions.items():
+            weight = sum(w * ways(mines - k - j) for j, w in others.items())
+            for i, c in enumerate(cell_counts):
+                cell_weights[i] += c * weight
+        for cell, w in zip(cells, cell_weights):
+            risks[cell] = w / total
+
+    # Interior cells share the mines left after the frontier's
+    if interior:
+        expected = sum(w * ways(mines - k) * (mines - k)
+                       for k, w in before[-1].items())
+        for cell in interior:
+            risks[cell] = expected / total / len(interior)
+    return risks
@@ -0,0 +1,154 @@
+"""
+Headless simulation of Minesweeper games played by the AI.
+
+Plays many seeded games for each board size and mine density across a pool
+of worker processes, and reports the win rate, the moves played per second
+and the time the AI spends per move, both adding knowledge (inference) and
+choosing its next move. A game is won once every safe cell is revealed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from minesweeper import BACKENDS, Minesweeper, MinesweeperAI
+
+
+def play(task):
+    """
+    Plays one game, given as a tuple (height, width, mines, seed, budget,
+    backend, no_guess), returning whether the AI won, the number of moves
+    it made, the seconds it spent on inference and on choosing moves, and
+    the seconds it took to generate the board. Boards generated to be
+    solvable without guessing are played from their starting cell.
+    """
+    height, width, mines, seed, budget, backend, no_guess = task
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines,
+                       no_guess=no_guess)
+    ai = MinesweeperAI(height=height, width=width, mines=mines, budget=budget,
+                       backend=backend)
+
+    inference = choice = 0
+    safe_cells = height * width - mines
+    move = (height // 2, width // 2) if no_guess else None
+    while len(ai.moves_made) < safe_cells:
+        start = time.perf_counter()
+        if move is None:
+            move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        choice += time.perf_counter() - start
+        if move is None or game.is_mine(move):
+            break
+
+        start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        inference += time.perf_counter() - start
+        move = None
+    won = len(ai.moves_made) == safe_cells
+    return won, len(ai.moves_made), inference, choice, game.generation_time
+
+
+def percentile(values, p):
+    """Returns the `p`th percentile of sorted `values` (nearest rank)."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def simulate(height, width, density, games, seed=0, budget=0.1,
+             backend="sentences", no_guess=False, processes=None):
+    """
+    Plays `games` games on boards of `height` by `width` cells with a
+    `density` fraction of mines, returning a record of the results.
+    """
+    mines = max(1, min(height * width - 1, round(density * height * width)))
+    tasks = [(height, width, mines, seed + i, budget, backend, no_guess)
+             for i in range(games)]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes or os.cpu_count() or 1) as pool:
+        results = pool.map(play, tasks, chunksize=max(1, games // 64))
+    elapsed = time.perf_counter() - start
+
+    wins = sum(won for won, _, _, _, _ in results)
+    moves = sum(n for _, n, _, _, _ in results)
+    inference = sum(t for _, _, t, _, _ in results)
+    choice = sum(t for _, _, _, t, _ in results)
+    generation = sum(t for _, _, _, _, t in results)
+
+    # Time per move within each game, to show the spread across games
+    per_move = sorted((t + c) / n for _, n, t, c, _ in results if n)
+    return {
+        "height": height,
+        "width": width,
+        "mines": mines,
+        "backend": backend,
+        "no_guess": no_guess,
+        "games": games,
+        "wins": wins,
+        "win_rate": wins / games if games else None,
+        "moves": moves,
+        "seconds": elapsed,
+        "moves_per_second": moves / (inference + choice) if moves else None,
+        "inference_ms_per_move": 1000 * inference / moves if moves else None,
+        "choice_ms_per_move": 1000 * choice / moves if moves else None,
+        "generation_ms_per_game": 1000 * generation / games if games else None,
+        "move_ms_by_game": {
+            f"p{p}": None if not per_move else 1000 * percentile(per_move, p)
+            for p in (50, 90, 99)
+        }
+    }
+
+
+def size(text):
+    """Parses a board size written HEIGHTxWIDTH."""
+    height, _, width = text.partition("x")
+    return int(height), int(width)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games with the AI, without a display.")
+    parser.add_argument("--sizes", type=size, nargs="+", default=[(8, 8)],
+                        help="board sizes, as HEIGHTxWIDTH")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.125],
+                        help="fractions of cells that are mines")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="games per size and density")
+    parser.add_argument("--budget", type=float, default=0.1,
+                        help="seconds the AI may spend on a guess")
+    parser.add_argument("--backend", choices=BACKENDS, default="sentences",
+                        help="inference backend of the AI")
+    parser.add_argument("--no-guess", action="store_true",
+                        help="play boards solvable without guessing")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="file to write records to")
+    args = parser.parse_args()
+
+    records = []
+    for height, width in args.sizes:
+        for density in args.densities:
+            record = simulate(height, width, density, args.games, args.seed,
+                              args.budget, args.backend, args.no_guess,
+                              args.processes)
+            records.append(record)
+            print(f"{height}x{width}, {record['mines']} mines: "
+                  f"won {record['wins']}/{record['games']} "
+                  f"({100 * (record['win_rate'] or 0):.1f}%), "
+                  f"{record['moves_per_second'] or 0:.0f} moves/s, "
+                  f"inference {record['inference_ms_per_move'] or 0:.3f} ms/move, "
+                  f"choice {record['choice_ms_per_move'] or 0:.3f} ms/move, "
+                  f"generation {record['generation_ms_per_game'] or 0:.3f} ms/game")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(records, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import math
 import random
 import time
 
+import numpy as np
+
 
 class Nim():
 
@@ -72,19 +74,103 @@ class Nim():
 
 class NimAI():
 
-    def __init__(self, alpha=0.5, epsilon=0.1):
+    def __init__(self, alpha=0.5, epsilon=0.1, initial=[1, 3, 5, 7]):
         """
-        Initialize AI with an empty Q-learning dictionary,
+        Initialize AI with an empty Q-learning table,
         an alpha (learning) rate, and an epsilon rate.
 
-        The Q-learning dictionary maps `(state, action)`
+        The Q-learning table maps `(state, action)`
         pairs to a Q-value (a number).
          - `state` is a tuple of remaining piles, e.g. (1, 1, 4, 4)
          - `action` is a tuple `(i, j)` for an action
+
+        The table is an array with a row per state and a column per
+        action, sized for games starting from `initial` piles and grown
+        when a larger state is seen. Row `state` is the number written
+        with digits `state` in the mixed radix of the largest piles,
+        and column `(i, j)` is `i * m + j - 1`, for `m` the largest pile.
+        Unknown Q-values are 0 and unavailable actions are -inf, so the
+        best action of a state is the argmax of its row.
         """
-        self.q = dict()
         self.alpha = alpha
         self.epsilon = epsilon
+        self.radices = None
+        self.resize(initial)
+
+    def resize(self, state):
+        """
+        Make room in the Q-learning table for states with at most
+        as many items per pile as `state`, keeping the known Q-values.
+        """
+        if self.radices is None:
+            radices = [pile + 1 for pile in state]
+        elif len(state) != len(self.radices):
+            raise ValueError(f"states must have {len(self.radices)} piles")
+        else:
+            radices = [max(r, pile + 1) for r, pile in zip(self.radices, state)]
+        size = max(radices) - 1
+
+        # Action (i, j) is available in a state if pile i has j items left
+        piles = np.indices(radices).reshape(len(radices), -1)
+        counts = np.arange(1, size + 1)
+        available = (
+            counts[None, None, :] <= piles.T[:, :, None]
+        ).reshape(len(piles.T), -1)
+        values = np.where(available, 0.0, -np.inf)
+        known = np.zeros(values.shape, dtype=bool)
+
+        # Copy the known Q-values over to their new row and column
+        if self.radices is not None:
+            rows, columns = np.nonzero(self.known)
+            states = np.unravel_index(rows, self.radices)
+            pile, count = np.divmod(columns, self.size)
+            moved = np.ravel_multi_index(states, radices), pile * size + count
+            values[moved] = self.values[rows, columns]
+            known[moved] = True
+
+        self.rows = {
+            tuple(state): row for row, state in enumerate(piles.T.tolist())
+        }
+        self.radices = radices
+        self.size = size
+        self.values = values
+        self.known = known
+
+        # Per state: how many Q-values are known, and the largest Q-value
+        # with the first action reaching it, or None until computed
+        self.stored = known.sum(axis=1).tolist()
+        self.best = [None] * len(values)
+
+    def row(self, state):
+        """
+        Return the row of `state` in the Q-learning table.
+        """
+        try:
+            return self.rows[tuple(state)]
+        except KeyError:
+            self.resize(state)
+            return self.rows[tuple(state)]
+
+    def column(self, action):
+        """
+        Return the column of `action` in the Q-learning table.
+        """
+        i, j = action
+        return i * self.size + j - 1
+
+    @property
+    def q(self):
+        """
+        The known Q-values, as a dictionary from `(state, action)` pairs.
+        """
+        rows, columns = np.nonzero(self.known)
+        states = zip(*np.unravel_index(rows, self.radices))
+        return {
+            (tuple(int(pile) for pile in state),
+             (int(column) // self.size, int(column) % self.size + 1)):
+            float(self.values[row, column])
+            for state, row, column in zip(states, rows, columns)
+        }
 
     def update(self, old_state, action, new_state, reward):
         """
@@ -99,12 +185,14 @@ class NimAI():
     def get_q_value(self, state, action):
         """
         Return the Q-value for the state `state` and the action `action`.
-        If no Q-value exists yet in `self.q`, return 0.
+        If no Q-value exists yet in the table, return 0.
         """
-        try:
-            return self.q[tuple(state), action]
-        except:
+        row = self.row(state)
+        i, j = action
+        if not 0 <= i < len(self.radices) or not 1 <= j <= self.size:
             return 0
+        column = self.column(action)
+        return float(self.values[row, column]) if self.known[row, column] else 0
 
     def update_q_value(self, state, action, old_q, reward, future_rewards):
         """
@@ -122,7 +210,50 @@ class NimAI():
         is the sum of the current reward and estimated future rewards.
         """
         new_q = reward + self.best_future_reward(state)
-        self.q[tuple(state), action] = old_q + self.alpha * (new_q - old_q)
+        value = old_q + self.alpha * (new_q - old_q)
+
+        row = self.row(state)
+        column = self.column(action)
+        previous = self.values[row, column]
+        if not self.known[row, column]:
+            self.known[row, column] = True
+            self.stored[row] += 1
+        self.values[row, column] = value
+
+        # Keep the best action of the state, unless it got worse
+        best = self.best[row]
+        if best is not None:
+            best_value, best_column = best
+            if column == best_column:
+                if value < previous:
+                    self.best[row] = None
+                else:
+                    self.best[row] = (value, column)
+            elif value > best_value or (value == best_value
+                                        and column < best_column):
+                self.best[row] = (value, column)
+
+    def best_action(self, row):
+        """
+        Return the largest Q-value of the actions available in state `row`
+        and the column of the first action with that value.
+        """
+        if self.best[row] is None:
+            column = int(np.argmax(self.values[row]))
+            self.best[row] = (float(self.values[row, column]), column)
+        return self.best[row]
+
+    def baseline(self, row):
+        """
+        Return the value any action must beat to be the best in state `row`:
+        one less than the smallest Q-value, or -2 if there is none.
+        It can only matter in states without known Q-values.
+        """
+        if self.stored[row]:
+            return -math.inf
+        if not self.known.any():
+            return -2
+        return float(self.values[self.known].min()) - 1
 
     def best_future_reward(self, state):
         """
@@ -131,18 +262,14 @@ class NimAI():
         of their Q-values.
 
         Use 0 as the Q-value if a `(state, action)` pair has no
-        Q-value in `self.q`. If there are no available actions in
+        Q-value in the table. If there are no available actions in
         `state`, return 0.
         """
-        reward = min(self.q.values()) - 1 if len(self.q) else -2
-        action = None
-        for i, pile in enumerate(state):
-            for j in range(1, pile + 1):
-                action = (i, j)
-                reward = max(reward, self.get_q_value(tuple(state), action))
-        if action is None:
+        if not any(state):
             return 0
-        return reward
+        row = self.row(state)
+        reward, _ = self.best_action(row)
+        return max(self.baseline(row), reward)
 
     def choose_action(self, state, epsilon=True):
         """
@@ -159,22 +286,24 @@ class NimAI():
         If multiple actions have the same Q-value, any of those
         options is an acceptable return value.
         """
+        row = self.row(state)
+        best_reward, column = self.best_action(row)
         best = None
-        actions = list()
-        best_reward = min(self.q.values()) - 1 if len(self.q) else -2
-        for i, pile in enumerate(state):
-            for j in range(1, pile + 1):
-                actions.append((i, j))
-                probed_reward = self.get_q_value(tuple(state), (i,j))
-                if probed_reward > best_reward:
-                    best_reward = probed_reward
-                    best = len(actions) - 1
-        # print('Nr.actions ', (actions), '-->', best, ' : ', best_reward)
+        if best_reward > self.baseline(row):
+            best = divmod(column, self.size)
+            best = (best[0], best[1] + 1)
         if not epsilon:
-            return actions[best]
+            return best
         random_chance = random.random()
-        random_pick = random.randint(0, len(actions)-1)
-        return actions[best] if random_chance > self.epsilon else actions[random_pick]
+        random_pick = random.randint(0, sum(state) - 1)
+        if random_chance > self.epsilon:
+            return best
+
+        # Available actions are listed pile by pile
+        for i, pile in enumerate(state):
+            if random_pick < pile:
+                return (i, random_pick + 1)
+            random_pick -= pile
 
 
 def train(n):
@@ -186,7 +315,8 @@ def train(n):
 
     # Play n games
     for i in range(n):
-        print(f"Playing training game {i + 1}")
+        if (i + 1) % max(1, n // 10) == 0:
+            print(f"Playing training game {i + 1}")
         game = Nim()
 
         # Keep track of last move made by either player
@@ -0,0 +1,102 @@
+"""
+Opening book for Tic Tac Toe.
+
+Solves every position reachable from the initial state, keeping one
+position per class of boards equal up to the 8 symmetries, and saves the
+best move of each to `book.json`, which `tictactoe.minimax` looks up
+before searching.
+"""
+import json
+import sys
+
+from tictactoe import BOOK_FILE, GAME
+
+
+def won(bits):
+    """
+    Returns True if the cells in `bits` fill a line.
+    """
+    return any(bits & line == line for line in GAME.lines)
+
+
+def score(x, o, maximizing, scores):
+    """
+    Returns the exact value of board (x, o) for X, with X to move if
+    `maximizing`. Wins are worth more the sooner they happen, so the book
+    finishes won games quickly and drags lost ones out. `scores` caches
+    the values by canonical key.
+    """
+    key = GAME.canonical(x, o)
+    if key in scores:
+        return scores[key]
+
+    empty = GAME.cells - (x | o).bit_count()
+    if won(o if maximizing else x):
+        value = -(1 + empty) if maximizing else 1 + empty
+    elif x | o == GAME.full:
+        value = 0
+    else:
+        values = [
+            score(x | 1 << n, o, False, scores) if maximizing
+            else score(x, o | 1 << n, True, scores)
+            for n in GAME.order if not (x | o) >> n & 1
+        ]
+        value = max(values) if maximizing else min(values)
+    scores[key] = value
+    return value
+
+
+def solve():
+    """
+    Returns a dictionary from the canonical key of every reachable
+    position where the game is not over to its best cell, in the
+    canonical orientation.
+    """
+    scores = dict()
+    moves = dict()
+    frontier = [0]
+    while frontier:
+        key = frontier.pop()
+        if key in moves:
+            continue
+
+        # Canonical keys encode the canonical orientation of the board
+        x, o = key >> GAME.cells, key & GAME.full
+        maximizing = x.bit_count() == o.bit_count()
+        if won(x) or won(o) or x | o == GAME.full:
+            continue
+
+        best, best_value = None, None
+        for n in GAME.order:
+            if (x | o) >> n & 1:
+                continue
+            if maximizing:
+                child = (x | 1 << n, o)
+            else:
+                child = (x, o | 1 << n)
+            value = score(*child, not maximizing, scores)
+            if best is None or (value > best_value if maximizing
+                                else value < best_value):
+                best, best_value = n, value
+            frontier.append(GAME.canonical(*child))
+        moves[key] = best
+    return moves
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [book.json]")
+    path = sys.argv[1] if len(sys.argv) == 2 else BOOK_FILE
+
+    moves = solve()
+    with open(path, "w") as f:
+        json.dump({"moves": {str(key): cell
+                             for key, cell in sorted(moves.items())}},
+                  f, separators=(",", ":"))
+    print(f"Wrote {len(moves)} positions to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,30 @@
 import pygame
 import sys
+import threading
 import time
 
 import tictactoe as ttt
 
+# Board dimensions and the number in a row to win, 3 3 3 by default
+if len(sys.argv) not in (1, 4):
+    sys.exit("Usage: python runner.py [rows columns k]")
+dimensions = tuple(int(arg) for arg in sys.argv[1:]) or (3, 3, 3)
+rows, columns, _ = dimensions
+
+# Seconds the AI may think about each move
+budget = 1.0
+
+
+def think(board, stop, answer):
+    """
+    Computes the AI move on `board` in a background thread, appending it
+    to `answer` unless `stop` was set because the game was reset.
+    """
+    move = ttt.minimax(board, budget, stop)
+    if not stop.is_set():
+        answer.append(move)
+
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,18 +36,33 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+
+# Shrink the tiles to fit larger boards
+tile_size = min(80, (height - 120) // rows, (width - 40) // columns)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 user = None
-board = ttt.initial_state()
-ai_turn = False
+board = ttt.initial_state(*dimensions)
+
+# Background search of the AI move: its thread, stop event and result
+worker = None
+stop = None
+answer = []
+
+# Redraw at a steady rate, leaving the AI thread time to search
+clock = pygame.time.Clock()
 
 while True:
 
+    reset = False
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
 
+        # Escape abandons the game at any time
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            reset = True
+
     screen.fill(black)
 
     # Let user choose a player.
@@ -67,13 +103,13 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (columns / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        cells = ttt.to_board(board)
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(columns):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -81,8 +117,8 @@ while True:
                 )
                 pygame.draw.rect(screen, white, rect, 3)
 
-                if board[i][j] != ttt.EMPTY:
-                    move = moveFont.render(board[i][j], True, white)
+                if cells[i][j] != ttt.EMPTY:
+                    move = moveFont.render(cells[i][j], True, white)
                     moveRect = move.get_rect()
                     moveRect.center = rect.center
                     screen.blit(move, moveRect)
@@ -108,23 +144,26 @@ while True:
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, searched in the background so that the
+        # window keeps drawing and handling events meanwhile
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if worker is None:
+                stop = threading.Event()
+                answer = []
+                worker = threading.Thread(
+                    target=think, args=(board, stop, answer), daemon=True)
+                worker.start()
+            elif answer:
+                board = ttt.result(board, answer[0])
+                worker = None
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
-                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
+            for i in range(rows):
+                for j in range(columns):
+                    if (cells[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
         if game_over:
@@ -139,8 +178,15 @@ while True:
                 mouse = pygame.mouse.get_pos()
                 if againButton.collidepoint(mouse):
                     time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+                    reset = True
+
+    # Start over, cancelling the AI search if it is running
+    if reset:
+        user = None
+        board = ttt.initial_state(*dimensions)
+        if worker is not None:
+            stop.set()
+            worker = None
 
     pygame.display.flip()
+    clock.tick(30)
@@ -1,101 +1,250 @@
 """
 Tic Tac Toe Player
+
+The game is played on a board of `rows` by `columns` cells, and whoever
+first fills `k` cells in a row, column or diagonal wins; the classic game
+has rows = columns = k = 3. A board is a tuple (x, o, game): bit
+columns * i + j of `x` (or `o`) is set when X (or O) has played in cell
+(i, j), and `game` is the `Game` with the board's dimensions. `from_board`
+and `to_board` convert from and to lists of rows of X, O and EMPTY cells.
 """
-import copy
+import json
 import math
+import os
+import threading
+import time
 
 X = "X"
 O = "O"
 EMPTY = None
 
 
-def initial_state():
+class Game():
+    """
+    Geometry of a game with `rows` by `columns` cells and `k` in a row to
+    win: the lines a player must fill, the order in which moves are
+    searched, and the symmetries of the board. Use `get_game` to share
+    one instance per set of dimensions.
+    """
+
+    def __init__(self, rows, columns, k):
+        if rows < 1 or columns < 1 or not 1 <= k <= max(rows, columns):
+            raise ValueError("invalid game dimensions")
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.cells = rows * columns
+        self.full = (1 << self.cells) - 1
+
+        # Every line of k cells, and the lines through each cell
+        lines = dict()
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    cells = [(i + di * t, j + dj * t) for t in range(k)]
+                    if all(0 <= a < rows and 0 <= b < columns
+                           for a, b in cells):
+                        lines[sum(1 << columns * a + b for a, b in cells)] = True
+        self.lines = list(lines)
+        self.cell_lines = [[line for line in self.lines if line >> n & 1]
+                           for n in range(self.cells)]
+
+        # Search cells on more lines first, then those nearer the center
+        self.order = sorted(range(self.cells), key=lambda n: (
+            -len(self.cell_lines[n]),
+            (2 * (n // columns) - rows + 1) ** 2
+            + (2 * (n % columns) - columns + 1) ** 2,
+            n
+        ))
+
+        # Score of a line holding only one player's marks, by their number
+        self.weights = [0] + [4 ** count for count in range(1, k + 1)]
+
+        # Rotations and reflections, as maps from each cell to its image
+        r, c = rows - 1, columns - 1
+        transforms = [
+            lambda i, j: (i, j),
+            lambda i, j: (r - i, c - j),
+            lambda i, j: (i, c - j),
+            lambda i, j: (r - i, j)
+        ]
+        if rows == columns:
+            transforms += [
+                lambda i, j: (j, i),
+                lambda i, j: (c - j, r - i),
+                lambda i, j: (j, r - i),
+                lambda i, j: (c - j, i)
+            ]
+        self.symmetries = [
+            [columns * a + b for a, b in
+             (transform(*divmod(n, columns)) for n in range(self.cells))]
+            for transform in transforms
+        ]
+
+        # Images of every byte of a bitboard under each symmetry
+        self.images = []
+        for symmetry in self.symmetries:
+            chunks = []
+            for start in range(0, self.cells, 8):
+                chunk = []
+                for byte in range(256):
+                    image = 0
+                    for t in range(min(8, self.cells - start)):
+                        if byte >> t & 1:
+                            image |= 1 << symmetry[start + t]
+                    chunk.append(image)
+                chunks.append(chunk)
+            self.images.append(chunks)
+
+    def __reduce__(self):
+        return (get_game, (self.rows, self.columns, self.k))
+
+    def image(self, s, bits):
+        """
+        Returns the image of bitboard `bits` under symmetry number `s`.
+        """
+        image = 0
+        for chunk in self.images[s]:
+            image |= chunk[bits & 255]
+            bits >>= 8
+        return image
+
+    def orientation(self, x, o):
+        """
+        Returns a key shared by board (x, o) and all its symmetric boards,
+        the smallest encoding x << cells | o among its symmetries, along
+        with the number of the symmetry mapping the board to it.
+        """
+        return min((self.image(s, x) << self.cells | self.image(s, o), s)
+                   for s in range(len(self.images)))
+
+    def canonical(self, x, o):
+        """
+        Returns the key of board (x, o) shared by all its symmetric boards.
+        """
+        return self.orientation(x, o)[0]
+
+    def wins(self, bits, cell):
+        """
+        Returns True if the cells in `bits` fill a line through `cell`.
+        """
+        for line in self.cell_lines[cell]:
+            if bits & line == line:
+                return True
+        return False
+
+    def evaluate(self, x, o):
+        """
+        Returns a heuristic score of board (x, o) for X: every line still
+        open to one player counts for them, more the fuller it is.
+        """
+        score = 0
+        for line in self.lines:
+            if not o & line:
+                score += self.weights[(x & line).bit_count()]
+            elif not x & line:
+                score -= self.weights[(o & line).bit_count()]
+        return score
+
+
+GAMES = dict()
+
+
+def get_game(rows=3, columns=3, k=3):
+    """
+    Returns the game with `rows` by `columns` cells and `k` in a row to win.
+    """
+    if (rows, columns, k) not in GAMES:
+        GAMES[rows, columns, k] = Game(rows, columns, k)
+    return GAMES[rows, columns, k]
+
+
+# The classic game
+GAME = get_game()
+
+
+def initial_state(rows=3, columns=3, k=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return (0, 0, get_game(rows, columns, k))
+
+
+def from_board(board, k=3):
+    """
+    Returns the board given as lists of rows of cells, with `k` in a row
+    to win.
+    """
+    x = o = 0
+    columns = len(board[0])
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << columns * i + j
+            elif cell == O:
+                o |= 1 << columns * i + j
+    return (x, o, get_game(len(board), columns, k))
+
+
+def to_board(board):
+    """
+    Returns a board as lists of rows of X, O and EMPTY cells.
+    """
+    x, o, game = board
+    cells = []
+    for i in range(game.rows):
+        row = []
+        for j in range(game.columns):
+            n = game.columns * i + j
+            row.append(X if x >> n & 1 else O if o >> n & 1 else EMPTY)
+        cells.append(row)
+    return cells
 
 
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    how_many_X = sum([int(cell == "X") for row in board for cell in row])
-    how_many_O = sum([int(cell == "O") for row in board for cell in row])
-    return X if (how_many_X + how_many_O) % 2 == 0 else O
+    x, o, _ = board
+    return X if x.bit_count() == o.bit_count() else O
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    possible_moves = set()
-    for i, row in enumerate(board):
-        for j, cell in enumerate(row):
-            if cell is None:
-                possible_moves.add((i, j))
-    return possible_moves
+    x, o, game = board
+    empty = game.full & ~(x | o)
+    return {divmod(n, game.columns)
+            for n in range(game.cells) if empty >> n & 1}
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    board_copy = copy.deepcopy(board)
-    if board_copy[action[0]][action[1]] is not None:
-        raise ValueError
-    if action is not None:
-        if max(action) > 2 or min(action) < 0:
-            raise ValueError
-        board_copy[action[0]][action[1]] = player(board_copy)
-    return board_copy
+    x, o, game = board
+    i, j = action
+    if not (0 <= i < game.rows and 0 <= j < game.columns):
+        raise ValueError("move out of the board")
+    cell = 1 << game.columns * i + j
+    if (x | o) & cell:
+        raise ValueError("cell already taken")
+    if player(board) == X:
+        return (x | cell, o, game)
+    return (x, o | cell, game)
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Check if X won
-    match_X = [[int(cell == X) for cell in row] for row in board]
-    match_X_T = [[row[i] for row in match_X] for i in
-                 range(len(match_X[0]))]  # Transposed match_X - to iterate through columns rather than rows
-
-    # X - ROWS and COLUMNS - Check winning combinations
-    row_total_X = [sum(rowX) for rowX in match_X]
-    col_total_X = [sum(colX) for colX in match_X_T]
-    if max(row_total_X) == 3 or max(col_total_X) == 3:
-        return X
-
-    # X - DIAGONAL - Check winning combinations
-    sum_diag_1_X = match_X[0][0] + match_X[1][1] + match_X[2][2]
-    if sum_diag_1_X == 3:
-        return X
-    sum_diag_2_X = match_X[0][2] + match_X[1][1] + match_X[2][0]
-    if sum_diag_2_X == 3:
-        return X
-
-    # Check if O won
-    match_O = [[int(cell == O) for cell in row] for row in board]
-    match_O_T = [[row[i] for row in match_O] for i in
-                 range(len(match_O[0]))]  # Transposed match_O - to iterate through columns rather than rows
-
-    # O - ROWS and COLUMNS - Check winning combinations
-    row_total_O = [sum(rowO) for rowO in match_O]
-    col_total_O = [sum(colO) for colO in match_O_T]
-    if max(row_total_O) == 3 or max(col_total_O) == 3:
-        return O
-
-    # O - DIAGONAL - Check winning combinations
-    sum_diag_1_O = match_O[0][0] + match_O[1][1] + match_O[2][2]
-    if sum_diag_1_O == 3:
-        return O
-    sum_diag_2_O = match_O[0][2] + match_O[1][1] + match_O[2][0]
-    if sum_diag_2_O == 3:
-        return O
-
-    # If no one wins
+    x, o, game = board
+    for line in game.lines:
+        if x & line == line:
+            return X
+        if o & line == line:
+            return O
     return None
 
 
@@ -103,19 +252,18 @@ def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    how_many_None = sum([int(cell is None) for row in board for cell in row])
-    if how_many_None == 0 or winner(board) is not None:
-        return True
-    return False
+    x, o, game = board
+    return x | o == game.full or winner(board) is not None
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
+    won = winner(board)
+    if won == X:
         return 1
-    if winner(board) == O:
+    if won == O:
         return -1
     return 0
 
@@ -156,15 +304,235 @@ def minimax_old(board):
     return optimal_move
 
 
-def minimax(board):
+def minimax(board, budget=None, stop=None):
     """
     Returns the optimal action for the current player on the board.
+    With a `budget` in seconds, returns the best action found in that time,
+    which is only optimal if the search could look to the end of the game.
+    The search also ends early with the best action found so far once
+    `stop` (a `threading.Event`) is set, so another thread can cancel it.
     """
-    if player(board) == O:
-        optimal_move = min_value(board)[1]
-    else:
-        optimal_move = max_value(board)[1]
-    return optimal_move
+    if terminal(board):
+        return None
+    move = book_move(board)
+    if move is not None:
+        return move
+    return SEARCH.best_move(board, budget, stop)
+
+
+# Transposition table flags: the stored value is exact, or only a
+# lower or upper bound because the search was cut off
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Score of a won game, plus the number of cells left empty so that
+# quicker wins score higher
+WIN = 10 ** 9
+
+# Number of positions a transposition table holds before it is cleared
+TABLE_LIMIT = 1 << 20
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search when its time budget runs out or it is stopped.
+    """
+
+
+class Search():
+    """
+    Iterative deepening alpha-beta search. Every iteration searches one
+    ply deeper than the last, scoring the positions at its horizon with
+    `Game.evaluate`, until the whole game tree is searched or the time
+    budget runs out. Each game has a transposition table keyed by
+    canonical boards, which persists across searches. `nodes`, `hits`
+    and `depth` are the positions searched, the transposition table hits
+    and the depth of the last completed iteration of the last search.
+    Searches from several threads run one at a time.
+    """
+
+    def __init__(self):
+        self.tables = dict()
+        self.nodes = 0
+        self.hits = 0
+        self.depth = 0
+        self.deadline = None
+        self.stop = None
+        self.horizon = False
+        self.lock = threading.Lock()
+
+    def best_move(self, board, budget=None, stop=None):
+        """
+        Returns the best action for the current player on the board found
+        within `budget` seconds (None for no limit), or before `stop`
+        is set.
+        """
+        with self.lock:
+            self.stop = stop
+            return self.deepen(board, budget)
+
+    def deepen(self, board, budget):
+        """
+        Returns the best action on the board, searching one ply deeper
+        at a time until the search is complete or interrupted.
+        """
+        x, o, game = board
+        self.nodes = 0
+        self.hits = 0
+        self.depth = 0
+        self.deadline = None if budget is None else time.perf_counter() + budget
+        table = self.tables.setdefault(game, dict())
+        if len(table) > TABLE_LIMIT:
+            table.clear()
+
+        maximizing = player(board) == X
+        moves = [n for n in game.order if not (x | o) >> n & 1]
+        best = moves[0]
+        for depth in range(1, len(moves) + 1):
+            self.horizon = False
+            try:
+                scores = self.root(x, o, game, maximizing, depth, moves)
+            except Timeout:
+                break
+
+            # Search the best moves of this iteration first in the next
+            moves.sort(key=scores.get, reverse=maximizing)
+            best = moves[0]
+            self.depth = depth
+
+            # Stop once no position was cut off by the horizon,
+            # or the game is won or lost
+            if not self.horizon or abs(scores[best]) >= WIN:
+                break
+        return divmod(best, game.columns)
+
+    def root(self, x, o, game, maximizing, depth, moves):
+        """
+        Returns the scores of `moves` on board (x, o) searched to `depth`
+        plies: exact for the best move and bounds for the others.
+        """
+        scores = dict()
+        alpha, beta = -math.inf, math.inf
+        for n in moves:
+            if maximizing:
+                value = self.value(x | 1 << n, o, game, False, depth - 1,
+                                   alpha, beta, n)
+                alpha = max(alpha, value)
+            else:
+                value = self.value(x, o | 1 << n, game, True, depth - 1,
+                                   alpha, beta, n)
+                beta = min(beta, value)
+            scores[n] = value
+        return scores
+
+    def value(self, x, o, game, maximizing, depth, alpha, beta, last):
+        """
+        Returns the score of board (x, o) searched to `depth` plies, with
+        X to move if `maximizing` and `last` the cell just played, if it
+        lies strictly between `alpha` and `beta`, or else a bound beyond
+        the one it falls outside.
+        """
+        self.nodes += 1
+        if not self.nodes & 1023 and (
+                (self.stop is not None and self.stop.is_set())
+                or (self.deadline is not None
+                    and time.perf_counter() > self.deadline)):
+            raise Timeout
+
+        # Only the player who just moved can have won, through `last`
+        empty = game.cells - (x | o).bit_count()
+        if game.wins(o if maximizing else x, last):
+            return -(WIN + empty) if maximizing else WIN + empty
+        if not empty:
+            return 0
+        if depth == 0:
+            self.horizon = True
+            return game.evaluate(x, o)
+
+        # Entries without positions cut off by the horizon hold at any depth
+        table = self.tables[game]
+        key = game.canonical(x, o)
+        entry = table.get(key)
+        if entry is not None:
+            searched, value, flag, exact = entry
+            if (searched >= depth or exact) and (
+                    flag == EXACT or (flag == LOWER and value >= beta)
+                    or (flag == UPPER and value <= alpha)):
+                self.hits += 1
+                if not exact:
+                    self.horizon = True
+                return value
+
+        window = alpha, beta
+        horizon = self.horizon
+        self.horizon = False
+        best = -math.inf if maximizing else math.inf
+        for n in game.order:
+            if (x | o) >> n & 1:
+                continue
+            if maximizing:
+                value = self.value(x | 1 << n, o, game, False, depth - 1,
+                                   alpha, beta, n)
+                if value > best:
+                    best = value
+                    alpha = max(alpha, value)
+            else:
+                value = self.value(x, o | 1 << n, game, True, depth - 1,
+                                   alpha, beta, n)
+                if value < best:
+                    best = value
+                    beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best <= window[0]:
+            flag = UPPER
+        elif best >= window[1]:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table[key] = (depth, best, flag, not self.horizon)
+        self.horizon = self.horizon or horizon
+        return best
+
+
+SEARCH = Search()
+
+# Opening book of the classic game, written by book.py
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.json")
+
+
+def load_book(path=BOOK_FILE):
+    """
+    Returns the opening book at `path`, mapping the canonical key of every
+    reachable position to its best cell in the canonical orientation,
+    or an empty book if there is no such file.
+    """
+    try:
+        with open(path) as f:
+            moves = json.load(f)["moves"]
+    except FileNotFoundError:
+        return dict()
+    return {int(key): cell for key, cell in moves.items()}
+
+
+BOOK = load_book()
+
+
+def book_move(board):
+    """
+    Returns the best action on the board according to the opening book,
+    or None if the book does not have the position.
+    """
+    x, o, game = board
+    if game is not GAME:
+        return None
+    key, s = game.orientation(x, o)
+    cell = BOOK.get(key)
+    if cell is None:
+        return None
+
+    # Map the cell back from the canonical orientation
+    return divmod(game.symmetries[s].index(cell), game.columns)
 
 
 def min_value(board):
@@ -0,0 +1,226 @@
+"""
+Headless self-play tournament between Tic Tac Toe engines.
+
+Every ordered pair of engines plays a number of games, spread over worker
+processes. The runner reports, per engine, the positions searched per
+second and percentiles of the time taken per move, and per match, how
+often X won, O won or the game was tied. On the classic board, a game lost
+by an engine that plays perfectly is reported as an error, so regressions
+in the search show up as failures rather than just as slower numbers.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import tictactoe as ttt
+
+# Engines: plain minimax, alpha-beta search, opening book backed by
+# alpha-beta search, and uniformly random moves
+ENGINES = ["minimax", "alphabeta", "book", "random"]
+
+# Engines that never lose the classic game (when searching without budget)
+PERFECT = {"minimax", "alphabeta", "book"}
+
+
+def plain_minimax(board):
+    """
+    Returns the minimax value of the board and the number of positions
+    searched, without pruning, transposition table or opening book.
+    """
+    if ttt.terminal(board):
+        return ttt.utility(board), 1
+    nodes = 1
+    values = []
+    for action in ttt.actions(board):
+        value, searched = plain_minimax(ttt.result(board, action))
+        values.append(value)
+        nodes += searched
+    return (max(values) if ttt.player(board) == ttt.X else min(values)), nodes
+
+
+class Engine():
+    """
+    Player in a tournament. `move` returns an action on a board along with
+    the number of positions searched to choose it.
+    """
+
+    def __init__(self, name, budget=None):
+        if name not in ENGINES:
+            raise ValueError(f"unknown engine: {name}")
+        self.name = name
+        self.budget = budget
+        self.search = ttt.Search()
+
+    def move(self, board, rng):
+        if self.name == "random":
+            return rng.choice(sorted(ttt.actions(board))), 0
+
+        if self.name == "minimax":
+            maximizing = ttt.player(board) == ttt.X
+            best, best_value, nodes = None, None, 0
+            for action in sorted(ttt.actions(board)):
+                value, searched = plain_minimax(ttt.result(board, action))
+                nodes += searched
+                if best is None or (value > best_value if maximizing
+                                    else value < best_value):
+                    best, best_value = action, value
+            return best, nodes
+
+        if self.name == "book":
+            action = ttt.book_move(board)
+            if action is not None:
+                return action, 0
+        action = self.search.best_move(board, self.budget)
+        return action, self.search.nodes
+
+
+def play(x, o, board, rng):
+    """
+    Plays a game from `board` between engines `x` and `o`, returning the
+    winner (None for a tie) and a list of (engine name, seconds, nodes)
+    for each move.
+    """
+    engines = {ttt.X: x, ttt.O: o}
+    moves = []
+    while not ttt.terminal(board):
+        engine = engines[ttt.player(board)]
+        start = time.perf_counter()
+        action, nodes = engine.move(board, rng)
+        elapsed = time.perf_counter() - start
+        moves.append((engine.name, elapsed, nodes))
+        board = ttt.result(board, action)
+    return ttt.winner(board), moves
+
+
+def play_games(task):
+    """
+    Plays the games of one task, a tuple (x name, o name, dimensions,
+    budget, seeds), returning their results. Engines are created once per
+    task, so their transposition tables carry over between its games.
+    """
+    x, o, dimensions, budget, seeds = task
+    engines = Engine(x, budget), Engine(o, budget)
+    return [
+        play(*engines, ttt.initial_state(*dimensions), random.Random(seed))
+        for seed in seeds
+    ]
+
+
+def percentile(values, p):
+    """Returns the `p`th percentile of sorted `values` (nearest rank)."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(engines, games, dimensions=(3, 3, 3), budget=None, processes=None,
+        seed=0):
+    """
+    Plays `games` games for every ordered pair of `engines` on boards of
+    `dimensions` (rows, columns, k), returning a report of the results.
+    """
+    processes = processes or os.cpu_count() or 1
+    matches = [(x, o) for x in engines for o in engines]
+
+    # Split every match into a few tasks per process
+    size = max(1, games * len(matches) // (4 * processes))
+    tasks = []
+    for x, o in matches:
+        for start in range(0, games, size):
+            seeds = range(seed + start, seed + min(games, start + size))
+            tasks.append((x, o, dimensions, budget, seeds))
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(play_games, tasks)
+    elapsed = time.perf_counter() - start
+
+    outcomes = {f"{x} vs {o}": {ttt.X: 0, ttt.O: 0, "tie": 0}
+                for x, o in matches}
+    latencies = {name: [] for name in engines}
+    nodes = dict.fromkeys(engines, 0)
+    errors = []
+    for (x, o, *_), played in zip(tasks, results):
+        for winner, moves in played:
+            outcomes[f"{x} vs {o}"][winner or "tie"] += 1
+            for name, seconds, searched in moves:
+                latencies[name].append(seconds)
+                nodes[name] += searched
+
+            # Perfect play never loses the classic game
+            loser = {ttt.X: o, ttt.O: x}.get(winner)
+            if (tuple(dimensions) == (3, 3, 3) and budget is None
+                    and loser in PERFECT):
+                errors.append(f"{loser} lost as {ttt.O if loser == o else ttt.X}"
+                              f" in {x} vs {o}")
+
+    report = {
+        "dimensions": list(dimensions),
+        "budget": budget,
+        "games": games * len(matches),
+        "processes": processes,
+        "seconds": elapsed,
+        "engines": dict(),
+        "outcomes": outcomes,
+        "errors": errors
+    }
+    for name in engines:
+        times = sorted(latencies[name])
+        total = sum(times)
+        report["engines"][name] = {
+            "moves": len(times),
+            "nodes": nodes[name],
+            "nodes_per_second": nodes[name] / total if total else None,
+            "latency_ms": {
+                f"p{p}": None if not times else 1000 * percentile(times, p)
+                for p in (50, 90, 99)
+            } | {"max": 1000 * times[-1] if times else None}
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Tic Tac Toe engines against each other.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+                        default=["alphabeta", "book", "random"])
+    parser.add_argument("--games", type=int, default=1000,
+                        help="games per ordered pair of engines")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("-k", type=int, default=3, help="marks in a row to win")
+    parser.add_argument("--budget", type=float,
+                        help="seconds per move (no limit by default)")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="file to write the report to")
+    args = parser.parse_args()
+
+    report = run(args.engines, args.games, (args.rows, args.columns, args.k),
+                 args.budget, args.processes, args.seed)
+
+    print(f"{report['games']} games in {report['seconds']:.2f} s "
+          f"on {report['processes']} processes")
+    for name, stats in report["engines"].items():
+        rate = stats["nodes_per_second"]
+        latency = stats["latency_ms"]
+        print(f"    {name:<10} {stats['moves']:8} moves"
+              f" {rate or 0:12.0f} nodes/s"
+              f"  p50 {latency['p50'] or 0:8.3f} ms"
+              f"  p99 {latency['p99'] or 0:8.3f} ms")
+    for match, outcome in report["outcomes"].items():
+        print(f"    {match:<24} X {outcome[ttt.X]:6}"
+              f"  O {outcome[ttt.O]:6}  tie {outcome['tie']:6}")
+    for error in report["errors"]:
+        print(f"    ERROR: {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()